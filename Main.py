@@ -1,23 +1,111 @@
-import tkinter as tk
-from mineSweep_GUI import Minesweeper_GUI
+import argparse
+import multiprocessing as mp
+import tempfile
+import time
 from mineSweep_agent import MinesweeperAgent
+from mineSweep_board import GENERATION_MODES
+from mineSweep_game import MinesweeperGame, train_agent
+from mineSweep_metrics import NULL_METRICS, Metrics, ProfileWindow
+from mineSweep_parallel import CollectorPool
+from mineSweep_patch_agent import PatchMinesweeperAgent
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the Minesweeper Q-learning agent")
+    parser.add_argument('--episodes', type=int, default=10000)
+    parser.add_argument('--height', type=int, default=15)
+    parser.add_argument('--width', type=int, default=15)
+    parser.add_argument('--mines', type=int, default=35)
+    parser.add_argument('--headless', action='store_true',
+                        help="Train against the NumPy game core without Tk")
+    parser.add_argument('--watch', action='store_true',
+                        help="Open a viewer process on a headless run; closing it leaves "
+                             "training running")
+    parser.add_argument('--agent', choices=('board', 'patch'), default='board',
+                        help="Key the Q-table on the whole board or on k x k cell windows")
+    parser.add_argument('--window', type=int, default=3,
+                        help="Window size k of the patch agent")
+    parser.add_argument('--symmetry', action='store_true',
+                        help="Share Q-table rows between rotations and reflections of a board "
+                             "(board agent only)")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Headless self-play collector processes (0 trains in-process)")
+    parser.add_argument('--generation', choices=GENERATION_MODES, default='random',
+                        help="Place mines up front, or on the first click keeping it safe "
+                             "(and, with no_guess, solvable without guessing)")
+    parser.add_argument('--load', help="Q-table directory to warm-start from")
+    parser.add_argument('--save', help="Q-table directory to save to after training")
+    parser.add_argument('--checkpoint-interval', type=int, default=0,
+                        help="Append changed states to --save every N episodes")
+    parser.add_argument('--metrics', help="Append periodic JSON-lines metrics to this file")
+    parser.add_argument('--tensorboard', help="Write the periodic metrics as TensorBoard summaries here")
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help="Seconds between metrics records")
+    parser.add_argument('--profile', help="Dump a cProfile capture of a window of episodes here")
+    parser.add_argument('--profile-start', type=int, default=100,
+                        help="Episode at which the profile capture starts")
+    parser.add_argument('--profile-episodes', type=int, default=100,
+                        help="Number of episodes in the profile capture")
+    return parser.parse_args()
 
 
 def main():
-    # num_episodes = int(input("How many trainging epsiodes: "))
-    # height = int(input("\nHeight: "))
-    # width = int(input("\nWidth: "))
-    # num_mines = int(input('\nNum of mines: '))
-    num_episodes = 10000
-    height = 15
-    width = 15
-    num_mines = 35
-    agent = MinesweeperAgent(height, width, num_mines)
-    gui = Minesweeper_GUI(height, width, num_mines, agent, num_episodes)
+    args = parse_args()
+    num_episodes = args.episodes
+    height = args.height
+    width = args.width
+    num_mines = args.mines
+    if args.agent == 'patch':
+        agent = PatchMinesweeperAgent(height, width, num_mines, window=args.window)
+    else:
+        agent = MinesweeperAgent(height, width, num_mines, symmetric=args.symmetry)
+    if args.load:
+        agent.load(args.load)
+    metrics = NULL_METRICS
+    if args.metrics or args.tensorboard:
+        metrics = Metrics(args.metrics, args.tensorboard, interval=args.metrics_interval)
+    profile = ProfileWindow(args.profile, args.profile_start, args.profile_episodes)
+
+    if args.headless:
+        feed = None
+        if args.watch:
+            # The window lives in its own process and can be closed at any time
+            from mineSweep_viewer import SnapshotFeed, run_viewer
+            feed = SnapshotFeed(channel=mp.Queue(maxsize=1))
+            mp.Process(target=run_viewer, args=(feed, height, width, "Training board"),
+                       daemon=True).start()
+        start_time = time.time()
+        if args.workers:
+            snapshot_path = args.save or tempfile.mkdtemp(prefix='q_table_')
+            with CollectorPool(agent, args.workers, snapshot_path,
+                               generation=args.generation) as pool:
+                _, wins, best_reward = pool.train(num_episodes, metrics=metrics, feed=feed)
+        else:
+            game = MinesweeperGame(height, width, num_mines, generation=args.generation)
+            wins, best_reward = train_agent(game, agent, num_episodes,
+                                            checkpoint_path=args.save,
+                                            checkpoint_interval=args.checkpoint_interval,
+                                            metrics=metrics, profile=profile, feed=feed)
+        metrics.close()
+        elapsed = time.time() - start_time
+        print(f'{num_episodes} episodes in {elapsed:.1f}s '
+              f'({num_episodes / elapsed:.1f} episodes/s), wins {wins}, best reward {best_reward}')
+        if args.save:
+            agent.save(args.save)
+        return
+
+    # Only import Tk when rendering, so headless runs work without a display
+    from mineSweep_GUI import Minesweeper_GUI
+    gui = Minesweeper_GUI(height, width, num_mines, agent, num_episodes,
+                          metrics=metrics, profile=profile, generation=args.generation)
     gui.start_game()
+    metrics.close()
+    if args.save:
+        agent.save(args.save)
+        return
     choice_save = input('Enter 1 to save:  ')
-    if choice_save == 1:
-        filename = 'test.ecsv'
+    if choice_save.strip() == '1':
+        filename = 'q_table'
         agent.save(filename)
     else:
         pass
@@ -1,8 +1,17 @@
-import tkinter as tk
+import functools
+import threading
 import numpy as np
 import tensorflow as tf
-from Minesweep_Tensor_Env import MinesweeperEnv
-from Minesweep_Tensor_GUI import MinesweeperGUI
+from Minesweep_Tensor_Env import BatchedMinesweeperEnv, make_parallel_env
+from Minesweep_Tensor_Env import observation_and_action_constraint_splitter
+from Minesweep_Tensor_Eval import evaluate, format_report
+from Minesweep_Tensor_GUI import display_cells
+from Minesweep_Tensor_Network import ConvQNetwork
+from Minesweep_Tensor_Replay import PrioritizedReplayBuffer
+from Minesweep_Tensor_TFEnv import TFMinesweeperEnv
+from mineSweep_metrics import NULL_METRICS, Metrics, ProfileWindow
+from mineSweep_symmetry import augment_experience, transforms
+from mineSweep_viewer import BoardViewer, SnapshotFeed
 from tf_agents.agents.dqn import dqn_agent
 from tf_agents.drivers import dynamic_step_driver
 from tf_agents.environments import tf_py_environment
@@ -13,161 +22,251 @@ from tf_agents.replay_buffers import tf_uniform_replay_buffer
 from tf_agents.trajectories import trajectory
 from tf_agents.utils import common
 from tf_agents.environments import gym_wrapper
+from tf_agents.system import system_multiprocessing as multiprocessing
 print("Num GPUs Available: ", len(tf.config.list_physical_devices('GPU')))
 
 # Hyperparameters
 num_iterations = 500
 initial_collect_steps = 100
 collect_steps_per_iteration = 10
-replay_buffer_max_length = 10
+replay_buffer_capacity = 100000  # Transitions kept across all training boards
 batch_size = 64
+# Sample transitions by TD error instead of uniformly; alpha sets how strongly,
+# beta the importance-sampling correction, annealed to 1 over training. Off by
+# default: prioritized batches are sampled and reprioritized eagerly, outside
+# the prefetched dataset and the compiled train step.
+prioritized_replay = False
+priority_alpha = 0.6
+priority_beta = 0.4
+# Train on every rotation and reflection of each sampled transition
+augment_symmetries = True
 learning_rate = 1e-3
 log_interval = 200
 num_eval_episodes = 120
 eval_interval = 100
 num_test_episodes = 1000
-# Create Minesweeper environment and its corresponding TensorFlow environment
-env = MinesweeperEnv(15, 15, 30)
-print("Original environment reset:", env.reset())
-
-train_env = tf_py_environment.TFPyEnvironment(env)
-eval_env = tf_py_environment.TFPyEnvironment(env)
+num_train_boards = 32  # Boards stepped together by the training environment
+collect_env = 'native'  # 'native' TF ops, 'batched' NumPy or 'parallel' processes
+num_parallel_envs = 4  # Worker processes when collect_env is 'parallel'
+use_action_mask = True  # Only let the agent pick legal moves
+# One-hot (H, W, C) observations with the revealed numbers and a fully
+# convolutional Q-network, instead of the flat state and dense layers
+use_conv_network = True
+# Draw boards on the first click so no episode dies on move one; 'no_guess'
+# needs collect_env 'batched' or 'parallel'
+board_generation = 'first_move_safe'
+train_seed = 0
+eval_seed = 1
+render = True  # Watch the first training board in a viewer window
+metrics_path = None  # JSON-lines file for periodic stage timings and rates
+tensorboard_dir = None  # Directory for the same metrics as TensorBoard summaries
+metrics_interval = 10.0  # Seconds between metrics records
+profile_path = None  # cProfile dump of iterations profile_start onwards
+profile_start = 100
+profile_iterations = 50
+
+metrics = NULL_METRICS
+if metrics_path or tensorboard_dir:
+    metrics = Metrics(metrics_path, tensorboard_dir, interval=metrics_interval)
+profile = ProfileWindow(profile_path, profile_start, profile_iterations)
+# Create the training environment. view_env is whatever holds the training
+# boards in this process; boards of the parallel env live in the workers.
+if collect_env == 'native':
+    train_env = TFMinesweeperEnv(15, 15, 30, batch_size=num_train_boards, seed=train_seed,
+                                 action_mask=use_action_mask, generation=board_generation,
+                                 spatial=use_conv_network)
+    view_env = train_env
+elif collect_env == 'parallel':
+    multiprocessing.enable_interactive_mode()
+    train_env = tf_py_environment.TFPyEnvironment(
+        make_parallel_env(15, 15, 30, num_parallel_envs, seed=train_seed,
+                          action_mask=use_action_mask, generation=board_generation,
+                          spatial=use_conv_network))
+    view_env = None
+else:
+    view_env = BatchedMinesweeperEnv(15, 15, 30, num_train_boards, seed=train_seed,
+                                     action_mask=use_action_mask,
+                                     generation=board_generation,
+                                     spatial=use_conv_network)
+    train_env = tf_py_environment.TFPyEnvironment(view_env)
 
 # Create Q-Network and DQN agent
 fc_layer_params = (100, 50)
-q_net = q_network.QNetwork(train_env.observation_spec(
-), train_env.action_spec(), fc_layer_params=fc_layer_params)
+conv_layer_params = ((32, 3),) * 4
+observation_spec = train_env.observation_spec()
+splitter = None
+if use_action_mask:
+    observation_spec = observation_spec['observation']
+    splitter = observation_and_action_constraint_splitter
+if use_conv_network:
+    q_net = ConvQNetwork(observation_spec, train_env.action_spec(),
+                         conv_layer_params=conv_layer_params)
+else:
+    q_net = q_network.QNetwork(observation_spec, train_env.action_spec(),
+                               fc_layer_params=fc_layer_params)
 optimizer = tf.keras.optimizers.Adam(learning_rate=learning_rate)
-train_step_counter = tf.Variable(0)
+train_step_counter = tf.Variable(0, dtype=tf.int64)
 agent = dqn_agent.DqnAgent(train_env.time_step_spec(),
                            train_env.action_spec(),
                            q_network=q_net,
                            optimizer=optimizer,
                            td_errors_loss_fn=common.element_wise_squared_loss,
+                           observation_and_action_constraint_splitter=splitter,
                            train_step_counter=train_step_counter)
 agent.initialize()
+# Compile the train step once instead of running it eagerly every iteration
+agent.train = common.function(agent.train)
+augment = common.function(functools.partial(augment_experience, height=15, width=15))
+num_copies = len(transforms(15, 15)) if augment_symmetries else 1
 
 # Replay buffer and data collection
-replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
-    data_spec=agent.collect_data_spec,
-    batch_size=train_env.batch_size,
-    max_length=replay_buffer_max_length)
+if prioritized_replay:
+    replay_buffer = PrioritizedReplayBuffer(
+        agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_capacity // train_env.batch_size,
+        alpha=priority_alpha,
+        seed=train_seed)
+else:
+    replay_buffer = tf_uniform_replay_buffer.TFUniformReplayBuffer(
+        data_spec=agent.collect_data_spec,
+        batch_size=train_env.batch_size,
+        max_length=replay_buffer_capacity // train_env.batch_size)
+# Step and episode counts are only tracked in the graph when metrics are on
+collect_observers = [replay_buffer.add_batch]
+env_steps = tf_metrics.EnvironmentSteps()
+num_episodes = tf_metrics.NumberOfEpisodes()
+if metrics.enabled:
+    collect_observers += [env_steps, num_episodes]
 collect_driver = dynamic_step_driver.DynamicStepDriver(
     train_env,
     agent.collect_policy,
-    observers=[replay_buffer.add_batch],
+    observers=collect_observers,
     num_steps=collect_steps_per_iteration)
+collect_driver.run = common.function(collect_driver.run)
+initial_collect_driver = dynamic_step_driver.DynamicStepDriver(
+    train_env,
+    agent.collect_policy,
+    observers=[replay_buffer.add_batch],
+    num_steps=initial_collect_steps)
+initial_collect_driver.run = common.function(initial_collect_driver.run)
 
-# Training
-initial_time_step = train_env.current_time_step()
-initial_policy_state = agent.collect_policy.get_initial_state(
-    train_env.batch_size)
-max_iterations = collect_steps_per_iteration
-
-
-def test_agent(eval_env, agent, num_episodes, render=True):
-    total_reward = 0
-
-
-
-    for episode in range(num_episodes):
-        time_step = eval_env.reset()
-        policy_state = agent.policy.get_initial_state(eval_env.batch_size)
-        episode_reward = 0
-
-        if render:
-            gui = MinesweeperGUI(eval_env.pyenv.envs[0])
-            gui.update()
-
-        while not time_step.is_last():
-            action_step = agent.policy.action(time_step, policy_state)
-            action = action_step.action.numpy()[0]
-
-            if render:
-                gui.update(action)
-                root.update()
-
-            time_step = eval_env.step(action_step.action)
-            episode_reward += time_step.reward.numpy().sum()
-
-        total_reward += episode_reward
-
-    return total_reward / num_episodes
 
 
 # Initial data collection
 print("Initial data collection")
-for _ in range(int(collect_steps_per_iteration)):
-    initial_time_step = train_env.current_time_step()
-    initial_policy_state = agent.collect_policy.get_initial_state(
-        train_env.batch_size)
-    max_iterations = collect_steps_per_iteration
-    collect_driver.run(time_step=initial_time_step,
-                       policy_state=initial_policy_state, maximum_iterations=max_iterations)
-    print(
-        f"Action: {collect_driver.policy.action(initial_time_step).action.numpy()}")
-# Initialize root and gui variables
-root = None
-gui = None
-
-if True:  # Set to True if you want to render the GUI during training
-    root = tk.Tk()
-    root.title("Testing Window")
-
-    gui = MinesweeperGUI(train_env.pyenv.envs[0])
-
-
-def train(agent, replay_buffer, batch_size, root=None, gui=None, render=True):
-    iterator = iter(replay_buffer.as_dataset(
-        num_parallel_calls=3, sample_batch_size=batch_size, num_steps=2).take(1))
-    experience, _ = next(iterator)
-    print("Experience:", experience)
-
-    if render:
-        if root is None and gui is None:
-            root = tk.Tk()
-            root.title("Testing Windoasdasdasdasdw")
-
-            gui = MinesweeperGUI(train_env.pyenv.envs[0])
-        gui.update()
-        root.update()
+initial_collect_driver.run(
+    time_step=train_env.current_time_step(),
+    policy_state=agent.collect_policy.get_initial_state(train_env.batch_size))
+
+# One persistent, prefetching pipeline of (s, s') pairs for every train step;
+# prioritized batches are drawn straight from the buffer instead
+iterator = None
+if not prioritized_replay:
+    dataset = replay_buffer.as_dataset(
+        num_parallel_calls=tf.data.AUTOTUNE,
+        sample_batch_size=batch_size,
+        num_steps=2).prefetch(tf.data.AUTOTUNE)
+    iterator = iter(dataset)
+
+
+def train(agent, iterator, metrics=NULL_METRICS):
+    if iterator is None:
+        return train_prioritized(agent, metrics)
+    with metrics.timer('replay_sample'):
+        experience, _ = next(iterator)
+        if augment_symmetries:
+            experience = augment(experience)
 
     # Train the agent
-    train_loss = agent.train(experience)
+    with metrics.timer('train_step'):
+        train_loss = agent.train(experience)
 
     # Return the loss_info object
     return train_loss
 
 
-# Main loop
-print("Main loop")
-for iteration in range(num_iterations):
-    print(f"Iteration: {iteration}")
-    initial_time_step = train_env.current_time_step()
-    initial_policy_state = agent.collect_policy.get_initial_state(
-        train_env.batch_size)
-    max_iterations = collect_steps_per_iteration
-    collect_driver.run(time_step=initial_time_step,
-                       policy_state=initial_policy_state, maximum_iterations=max_iterations)
-    experience, _ = next(iter(replay_buffer.as_dataset(
-        num_parallel_calls=3, sample_batch_size=batch_size, num_steps=2).take(1)))
+def train_prioritized(agent, metrics=NULL_METRICS):
+    progress = min(agent.train_step_counter.numpy() / num_iterations, 1.0)
+    with metrics.timer('replay_sample'):
+        experience, leaves, weights = replay_buffer.sample(
+            batch_size, beta=priority_beta + (1.0 - priority_beta) * progress)
+        if augment_symmetries:
+            experience = augment(experience)
+            weights = tf.tile(weights, [num_copies])
 
-    print("Experience shape:", {k: v.shape if hasattr(
-        v, 'shape') else str(v) for k, v in experience._asdict().items()})
+    # Train the agent, weighting each transition's loss by its IS weight
+    with metrics.timer('train_step'):
+        train_loss = agent.train(experience, weights=weights)
 
-    train_loss = train(agent, replay_buffer, batch_size,
-                       root=root, gui=gui).loss
+    with metrics.timer('replay_update'):
+        # A transition's priority is its mean TD error over its copies
+        td_errors = np.abs(train_loss.extra.td_error.numpy()).reshape(num_copies, -1)
+        replay_buffer.update_priorities(leaves, td_errors.mean(axis=0))
 
-    step = agent.train_step_counter.numpy()
+    # Return the loss_info object
+    return train_loss
 
-    if step % log_interval == 0:
-        print('step = {0}: loss = {1}'.format(step, train_loss))
 
-    if step % eval_interval == 0:
-        avg_return = tf_metrics.compute_avg_return(
-            eval_env, agent.policy, num_episodes=num_eval_episodes)
-        print('step = {0}: Average Return = {1}'.format(step, avg_return))
+def run_training(feed=None):
+    # Main loop. With a feed, a snapshot of the first training board is
+    # published at most once per feed interval; publishing never waits for
+    # the viewer, so a slow or closed window does not slow training down.
+    print("Main loop")
+    time_step = train_env.current_time_step()
+    policy_state = agent.collect_policy.get_initial_state(train_env.batch_size)
+    for iteration in range(num_iterations):
+        with metrics.timer('collect'):
+            time_step, policy_state = collect_driver.run(
+                time_step=time_step, policy_state=policy_state)
+
+        train_loss = train(agent, iterator, metrics).loss
+
+        step = agent.train_step_counter.numpy()
+
+        if feed is not None:
+            with metrics.timer('render'):
+                feed.publish(lambda: display_cells(view_env.state[0], view_env.board[0]),
+                             lambda: f'Step: {step}\nLoss: {float(train_loss):.4f}')
+
+        if metrics.enabled:
+            metrics.count('train_steps')
+            metrics.set_count('steps', int(env_steps.result()))
+            metrics.set_count('episodes', int(num_episodes.result()))
+            metrics.gauge('replay_frames', int(replay_buffer.num_frames()))
+            metrics.gauge('loss', float(train_loss))
+            metrics.maybe_emit()
+        profile.tick()
+
+        if step % log_interval == 0:
+            print('step = {0}: loss = {1}'.format(step, train_loss))
+
+        if step % eval_interval == 0:
+            with metrics.timer('evaluate'):
+                results = evaluate(agent.policy, 15, 15, 30,
+                                   num_episodes=num_eval_episodes, seed=eval_seed,
+                                   action_mask=use_action_mask,
+                                   generation=board_generation,
+                                   spatial=use_conv_network)
+            print('step = {0}:\n{1}'.format(step, format_report(results)))
+    profile.finish()
+
+
+if render and view_env is not None:
+    # Training runs in a worker thread and Tk owns this one. Closing the
+    # window only detaches the viewer; training carries on to the end.
+    feed = SnapshotFeed()
+    worker = threading.Thread(target=run_training, args=(feed,), daemon=True)
+    worker.start()
+    BoardViewer(feed, 15, 15, title="Training board").run()
+    worker.join()
+else:
+    run_training()
+metrics.close()
 
 # Testing the agent
-avg_test_reward = test_agent(eval_env, agent, num_test_episodes)
-print(f'Average reward over {num_test_episodes} episodes: {avg_test_reward}')
+results = evaluate(agent.policy, 15, 15, 30,
+                   num_episodes=num_test_episodes, seed=eval_seed,
+                   action_mask=use_action_mask, generation=board_generation,
+                   spatial=use_conv_network)
+print(f'Test over {num_test_episodes} episodes:\n{format_report(results)}')
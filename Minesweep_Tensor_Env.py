@@ -1,17 +1,49 @@
+import functools
 import numpy as np
 import tensorflow as tf
+from tf_agents.environments import parallel_py_environment
 from tf_agents.environments import py_environment
 from tf_agents.specs import array_spec
 from tf_agents.trajectories import time_step as ts
 from gym.spaces import Discrete, Tuple, Box
-import random
+from mineSweep_board import MINE, generate_board, generate_boards, generate_mines, generate_opening
+from mineSweep_board import label_zero_regions
+from mineSweep_board import CELL_BITS, neighbour_counts, pack_cells, test_cells, unpack_cells
+from mineSweep_board import zero_regions
+
+# Planes of the spatial observation: hidden, flagged, then revealed cells by
+# their neighbour count 0-8
+HIDDEN_PLANE = 0
+FLAGGED_PLANE = 1
+COUNT_PLANE = 2
+SPATIAL_CHANNELS = COUNT_PLANE + 9
+# Row k is the one-hot spatial encoding of plane k
+_PLANES = np.eye(SPATIAL_CHANNELS, dtype=np.float32)
 
 
 class MinesweeperEnv(py_environment.PyEnvironment):
-    def __init__(self, height, width, mines):
+    def __init__(self, height, width, mines, seed=None, action_mask=False, generation='random',
+                 spatial=False):
+        # Start a new board after a mine instead of playing on the old one
+        super().__init__(handle_auto_reset=True)
         self.height = height
         self.width = width
         self.mines = mines
+        # With action_mask the observation also carries the legal actions
+        self.action_mask = action_mask
+        # With spatial the observation is an (H, W, SPATIAL_CHANNELS) one-hot
+        # tensor that shows the revealed numbers, see spatial_observation
+        self.spatial = spatial
+        # One of mineSweep_board.GENERATION_MODES
+        self.generation = generation
+        # Each environment draws boards from its own generator
+        self._rng = np.random.default_rng(seed)
+        # Two observation buffers used in turn, see BatchedMinesweeperEnv
+        cells = height * width
+        shape = (height, width, SPATIAL_CHANNELS) if spatial else (cells,)
+        self._observations = np.zeros((2,) + shape, dtype=np.float32)
+        self._legal = np.zeros((2, cells * 2), dtype=np.int8)
+        self._buffer = 0
 
         self.reset()
 
@@ -25,21 +57,32 @@ class MinesweeperEnv(py_environment.PyEnvironment):
         return row * self.width * 2 + col * 2 + action_type
 
     def _reset(self):
-        self.board = self.generate_board()
-        self.state = np.zeros((self.height, self.width), dtype=int)
+        if self.generation == 'random':
+            self._place_board()
+        else:
+            # Mines are placed on the first action, see _step
+            self.board = np.zeros((self.height, self.width), dtype=np.int8)
+            self._board_ready = False
+        self.state = np.zeros((self.height, self.width), dtype=np.int8)
         return ts.restart(self.get_observation())
 
+    def _place_board(self, cell=-1):
+        self.board = generate_opening(self.height, self.width, self.mines, cell,
+                                      self.generation, self._rng)
+        self._zero_labels, self._zero_regions = zero_regions(self.board)
+        self._board_ready = True
+
     def _step(self, action):
         row, col, action_type = self._decode_action(action)
+        if not self._board_ready:
+            self._place_board(row * self.width + col if action_type == 0 else -1)
 
         if action_type == 0:  # Reveal
             if self.board[row][col] == -1:  # Mine
                 reward = -1
                 done = True
             else:
-                revealed_cells = self.reveal_cell(row, col)
-                for revealed_row, revealed_col in revealed_cells:
-                    self.state[revealed_row][revealed_col] = 1
+                self.reveal_cell(row, col)
                 reward = 1
                 done = False
 
@@ -61,35 +104,24 @@ class MinesweeperEnv(py_environment.PyEnvironment):
         )
 
     def reveal_cell(self, row, col):
+        # Returns the flat indices of the cells revealed by this click. A 0
+        # cell reveals its whole precomputed region and border in one go.
         if self.state[row][col] == 1:  # If the cell is already revealed
-            return set()
+            return np.empty(0, dtype=np.int64)
 
         if self.board[row][col] == -1:  # If the cell is a mine
             self.reset()  # Reset the board
-            return set()
-
-        if self.board[row][col] > 0:  # If the cell is a number
-            self.state[row][col] = 1  # Set the cell state to revealed
-            return {(row, col)}
-
-        if self.board[row][col] == 0:  # If the cell is a 0 cell
-            self.state[row][col] = 1  # Set the cell state to revealed
-            revealed_cells = {(row, col)}
+            return np.empty(0, dtype=np.int64)
 
-            # Reveal surrounding 0 cells
-            for i in range(-1, 2):
-                for j in range(-1, 2):
-                    if 0 <= row + i < self.height and 0 <= col + j < self.width and self.board[row + i][col + j] != -1:
-                        revealed_cells |= self.reveal_cell(row + i, col + j)
-
-            return revealed_cells
+        if self.board[row][col] == 0:
+            revealed_cells = self._zero_regions[self._zero_labels[row, col]]
         else:
-            return set()
+            revealed_cells = np.array([row * self.width + col])
+        self.state.flat[revealed_cells] = 1
+        return revealed_cells
 
     def observation_spec(self):
-        return array_spec.BoundedArraySpec(
-            shape=(self.height * self.width,), dtype=np.float32, minimum=0, maximum=2, name='observation'
-        )
+        return _observation_spec(self.height, self.width, self.action_mask, self.spatial)
 
     def _decode_action(self, action):
         row = action // (self.width * 2)
@@ -98,34 +130,348 @@ class MinesweeperEnv(py_environment.PyEnvironment):
         return row, col, action_type
 
     def get_observation(self):
-        return self.state.flatten().astype(np.float32)
+        # Written into the next of the two buffers, no per-step allocation
+        self._buffer = 1 - self._buffer
+        observation = self._observations[self._buffer]
+        if self.spatial:
+            spatial_observation(self.state, self.board, out=observation)
+        else:
+            np.copyto(observation, self.state.reshape(-1))
+        if self.action_mask:
+            return {'observation': observation,
+                    'legal_actions': legal_actions(self.state, out=self._legal[self._buffer])}
+        return observation
 
     def close(self):
         pass
 
     def generate_board(self):
-        board = [[0 for _ in range(self.width)] for _ in range(self.height)]
-
-        mines_placed = 0
-        while mines_placed < self.mines:
-            row = random.randint(0, self.height - 1)
-            col = random.randint(0, self.width - 1)
-            if board[row][col] == 0:
-                board[row][col] = -1
-                mines_placed += 1
-
-        for row in range(self.height):
-            for col in range(self.width):
-                if board[row][col] == -1:
-                    continue
-
-                mines_count = 0
-                for i in range(-1, 2):
-                    for j in range(-1, 2):
-                        if 0 <= row + i < self.height and 0 <= col + j < self.width:
-                            if board[row + i][col + j] == -1:
-                                mines_count += 1
-
-                board[row][col] = mines_count
-
-        return np.array(board)
+        return generate_board(self.height, self.width, self.mines, self._rng)
+
+
+class BatchedMinesweeperEnv(py_environment.PyEnvironment):
+    # Steps `batch_size` independent boards per call, applying every action
+    # of the batch with the same vectorized NumPy operations. Rewards and
+    # action encoding match MinesweeperEnv; a board that terminated is reset
+    # on its next step.
+    #
+    # The core is bit-packed: mines and the revealed and flagged status are
+    # (N, ceil(H*W / 8)) uint8 bitsets (see mineSweep_board.pack_cells) next
+    # to int8 neighbour counts. Observations and int8 legal-action masks live
+    # in two preallocated buffers that take turns: a step brings the other
+    # buffer up to date by copying the rows of the boards the previous step
+    # changed, then writes only the cells it changes itself. An observation
+    # therefore stays valid until the env has been stepped twice, which covers
+    # a driver holding the previous and the current time step.
+    #
+    # Outside 'random' generation a board is drawn on its first action, all
+    # boards placed in one step with one vectorized call.
+    def __init__(self, height, width, mines, batch_size, seed=None, action_mask=False,
+                 generation='random', spatial=False):
+        super().__init__()
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.action_mask = action_mask
+        self.spatial = spatial
+        self.generation = generation
+        self._batch_size = batch_size
+        self._rng = np.random.default_rng(seed)
+
+        self.reset()
+
+    @property
+    def batched(self):
+        return True
+
+    @property
+    def batch_size(self):
+        return self._batch_size
+
+    @property
+    def board(self):
+        # (N, H, W) int8 boards, MINE for mines; built on demand
+        mines = unpack_cells(self._mine_bits, self.height, self.width)
+        return np.where(mines, np.int8(MINE), self._counts)
+
+    @property
+    def state(self):
+        # (N, H, W) int8 states, 0 hidden, 1 revealed, 2 flagged; built on demand
+        revealed = unpack_cells(self._revealed_bits, self.height, self.width)
+        flagged = unpack_cells(self._flagged_bits, self.height, self.width)
+        return revealed.astype(np.int8) + 2 * flagged.astype(np.int8)
+
+    @property
+    def revealed_count(self):
+        # Revealed cells per board, kept up to date by every step
+        return self._revealed_count
+
+    def action_spec(self):
+        return array_spec.BoundedArraySpec(
+            shape=(), dtype=np.int32, minimum=0, maximum=self.height * self.width * 2 - 1, name='action'
+        )
+
+    def observation_spec(self):
+        return _observation_spec(self.height, self.width, self.action_mask, self.spatial)
+
+    def _reset(self):
+        count, cells = self._batch_size, self.height * self.width
+        nbytes = (cells + 7) // 8
+        self._mine_bits = np.zeros((count, nbytes), dtype=np.uint8)
+        self._revealed_bits = np.zeros((count, nbytes), dtype=np.uint8)
+        self._flagged_bits = np.zeros((count, nbytes), dtype=np.uint8)
+        self._counts = np.zeros((count, self.height, self.width), dtype=np.int8)
+        # Region labels restart on every board (see label_zero_regions), so
+        # int16 holds them on boards below 32768 cells whatever the batch size
+        label_dtype = np.int16 if cells < 2 ** 15 else np.int32
+        self._zero_labels = np.zeros((count, self.height, self.width), dtype=label_dtype)
+        self._revealed_count = np.zeros(count, dtype=np.int32)
+        self._pending = np.zeros(count, dtype=bool)
+        # Spatial observations are kept as (N, H*W, SPATIAL_CHANNELS) and
+        # handed out as (N, H, W, SPATIAL_CHANNELS) views
+        shape = (count, cells, SPATIAL_CHANNELS) if self.spatial else (count, cells)
+        self._observations = np.zeros((2,) + shape, dtype=np.float32)
+        self._legal = np.ones((2, count, cells * 2), dtype=np.int8)
+        self._buffer = 0
+        # Boards whose rows differ between the two buffers
+        self._dirty = np.ones(count, dtype=bool)
+        self._boards = np.arange(count)
+        self._reset_boards(np.ones(count, dtype=bool))
+        self._episode_ended = np.zeros(count, dtype=bool)
+        return ts.restart(self.get_observation(), batch_size=self._batch_size)
+
+    def _reset_boards(self, mask):
+        boards = np.flatnonzero(mask)
+        if self.generation == 'random':
+            self._place_boards(boards)
+        else:
+            self._pending[boards] = True
+            self._mine_bits[boards] = 0
+            self._counts[boards] = 0
+        self._revealed_bits[boards] = 0
+        self._flagged_bits[boards] = 0
+        self._revealed_count[boards] = 0
+        self._observations[self._buffer, boards] = _PLANES[HIDDEN_PLANE] if self.spatial else 0
+        if self.action_mask:
+            self._legal[self._buffer, boards] = 1
+        self._dirty[boards] = True
+
+    def _place_boards(self, boards, safe_cells=None):
+        if self.generation == 'no_guess':
+            mines = np.stack([generate_opening(self.height, self.width, self.mines, cell,
+                                               self.generation, self._rng) == MINE
+                              for cell in safe_cells])
+        else:
+            mines = generate_mines(len(boards), self.height, self.width, self.mines,
+                                   self._rng, safe_cells)
+        counts = neighbour_counts(mines)
+        self._mine_bits[boards] = pack_cells(mines)
+        self._counts[boards] = counts
+        self._zero_labels[boards] = label_zero_regions(np.where(mines, np.int8(MINE), counts))
+        self._pending[boards] = False
+
+    def _swap_buffers(self):
+        previous, self._buffer = self._buffer, 1 - self._buffer
+        boards = np.flatnonzero(self._dirty)
+        if len(boards) == self._batch_size:
+            boards = slice(None)  # A plain copy beats gathering every row
+        elif not len(boards):
+            return
+        self._observations[self._buffer, boards] = self._observations[previous, boards]
+        if self.action_mask:
+            self._legal[self._buffer, boards] = self._legal[previous, boards]
+        self._dirty[boards] = False
+
+    def _step(self, action):
+        action = np.asarray(action).reshape(self._batch_size)
+        self._swap_buffers()
+        # Boards whose previous step was LAST start a new episode and ignore
+        # their action for this step.
+        restarted = self._episode_ended
+        if restarted.any():
+            self._reset_boards(restarted)
+
+        rows, cols, action_types = self._decode_action(action)
+        cells = rows * self.width + cols
+        boards = self._boards
+        active = ~restarted
+        place = active & self._pending
+        if place.any():
+            self._place_boards(boards[place],
+                               np.where(action_types[place] == 0, cells[place], -1))
+        is_mine = test_cells(self._mine_bits, boards, cells)
+
+        reveal = active & (action_types == 0)
+        flag = active & (action_types == 1)
+        hit_mine = reveal & is_mine
+        safe = reveal & ~is_mine
+
+        if flag.any():
+            self.flag_cells(boards[flag], rows[flag], cols[flag])
+        if safe.any():
+            self.reveal_cells(boards[safe], rows[safe], cols[safe])
+
+        # A mine is only hit on a board that did not restart
+        reward = np.subtract(safe, hit_mine, dtype=np.float32)
+        step_type = np.where(restarted, ts.StepType.FIRST, ts.StepType.MID + hit_mine)
+        discount = (~hit_mine).astype(np.float32)
+        self._episode_ended = hit_mine
+
+        return ts.TimeStep(step_type, reward, discount, self.get_observation())
+
+    def flag_cells(self, boards, rows, cols):
+        # Flag one cell on each of the given boards. Like MinesweeperEnv a
+        # flag also covers a revealed cell.
+        cells = rows * self.width + cols
+        index, bit = cells >> 3, CELL_BITS[cells & 7]
+        revealed = self._revealed_bits[boards, index]
+        self._revealed_bits[boards, index] = revealed & ~bit
+        self._flagged_bits[boards, index] |= bit
+        self._revealed_count[boards] -= (revealed & bit) != 0
+        self._dirty[boards] = True
+
+        self._observations[self._buffer, boards, cells] = (
+            _PLANES[FLAGGED_PLANE] if self.spatial else 2)
+        if self.action_mask:
+            self._legal_pairs()[boards, cells] = (1, 0)
+
+    def reveal_cells(self, boards, rows, cols):
+        # Reveal one cell on each of the given boards at once. A click on a 0
+        # cell reveals the precomputed region it belongs to plus its border;
+        # any other click sets its bits directly.
+        cells = rows * self.width + cols
+        fresh = ~test_cells(self._revealed_bits, boards, cells)
+        boards, rows, cols, cells = boards[fresh], rows[fresh], cols[fresh], cells[fresh]
+        if not len(boards):
+            return
+        self._dirty[boards] = True
+        clicked = self._zero_labels[boards, rows, cols]
+        on_zero = clicked >= 0
+        single = ~on_zero
+        if single.any():
+            self._reveal_single(boards[single], cells[single])
+        if on_zero.any():
+            self._reveal_regions(boards[on_zero], clicked[on_zero])
+
+    def _reveal_single(self, boards, cells):
+        index, bit = cells >> 3, CELL_BITS[cells & 7]
+        self._revealed_bits[boards, index] |= bit
+        self._flagged_bits[boards, index] &= ~bit
+        self._revealed_count[boards] += 1
+        self._write_revealed(boards, cells)
+
+    def _reveal_regions(self, boards, labels):
+        # Zero region `labels[i]` of board `boards[i]` plus its border
+        region = self._zero_labels[boards] == labels[:, None, None]
+        bits = pack_cells(_dilate(region))
+        old = self._revealed_bits[boards]
+        added = np.unpackbits(bits & ~old, axis=-1).sum(axis=-1, dtype=np.int32)
+        self._revealed_bits[boards] = old | bits
+        self._flagged_bits[boards] &= ~bits
+        self._revealed_count[boards] += added
+
+        # Only the revealed cells of the observation and mask are written
+        which, cells = np.nonzero(np.unpackbits(bits, axis=-1, count=self.height * self.width,
+                                                bitorder='little'))
+        self._write_revealed(boards[which], cells)
+
+    def _write_revealed(self, boards, cells):
+        if self.spatial:
+            counts = self._counts.reshape(self._batch_size, -1)[boards, cells]
+            self._observations[self._buffer, boards, cells] = _PLANES[COUNT_PLANE + counts]
+        else:
+            self._observations[self._buffer, boards, cells] = 1
+        if self.action_mask:
+            self._legal_pairs()[boards, cells] = 0
+
+    def _legal_pairs(self):
+        # Current legal-action mask as (N, H*W, 2) (reveal, flag) pairs
+        return self._legal[self._buffer].reshape(self._batch_size, -1, 2)
+
+    def _decode_action(self, action):
+        cell, action_type = np.divmod(action, 2)
+        row, col = np.divmod(cell, self.width)
+        return row, col, action_type
+
+    def get_observation(self):
+        observation = self._observations[self._buffer]
+        if self.spatial:
+            observation = observation.reshape(self._batch_size, self.height, self.width, -1)
+        if self.action_mask:
+            return {'observation': observation, 'legal_actions': self._legal[self._buffer]}
+        return observation
+
+    def close(self):
+        pass
+
+    def generate_boards(self, count):
+        return generate_boards(count, self.height, self.width, self.mines, self._rng)
+
+
+def make_parallel_env(height, width, mines, num_envs, seed=None, action_mask=False,
+                      generation='random', spatial=False):
+    # num_envs independent MinesweeperEnv copies, each in its own process and
+    # seeded from a child of one SeedSequence so runs are reproducible
+    seeds = np.random.SeedSequence(seed).spawn(num_envs)
+    return parallel_py_environment.ParallelPyEnvironment(
+        [functools.partial(MinesweeperEnv, height, width, mines, seed=child,
+                           action_mask=action_mask, generation=generation, spatial=spatial)
+         for child in seeds])
+
+
+def legal_actions(state, out=None):
+    # Legal-action mask in action order for one or more (H, W) states: any
+    # cell that is not revealed may be revealed, only hidden cells flagged.
+    # Written into `out`, an int8 (..., H*W*2) array, when given.
+    if out is None:
+        out = np.empty(state.shape[:-2] + (state.shape[-2] * state.shape[-1] * 2,),
+                       dtype=np.int8)
+    pairs = out.reshape(state.shape + (2,))
+    np.not_equal(state, 1, out=pairs[..., 0])
+    np.equal(state, 0, out=pairs[..., 1])
+    return out
+
+
+def spatial_observation(state, board, out=None):
+    # One-hot (..., H, W, SPATIAL_CHANNELS) planes for one or more (H, W)
+    # states and boards. A revealed mine, only seen on a LAST step, shows as
+    # hidden. Written into `out`, a float32 array, when given.
+    codes = np.where(state == 2, FLAGGED_PLANE, HIDDEN_PLANE)
+    codes = np.where((state == 1) & (board >= 0), COUNT_PLANE + board, codes)
+    if out is None:
+        out = np.empty(state.shape + (SPATIAL_CHANNELS,), dtype=np.float32)
+    np.equal(codes[..., None], np.arange(SPATIAL_CHANNELS), out=out, casting='unsafe')
+    return out
+
+
+def observation_and_action_constraint_splitter(observation):
+    # For DqnAgent/QNetwork when the env was built with action_mask=True
+    return observation['observation'], observation['legal_actions']
+
+
+def _observation_spec(height, width, action_mask, spatial=False):
+    if spatial:
+        observation = array_spec.BoundedArraySpec(
+            shape=(height, width, SPATIAL_CHANNELS), dtype=np.float32, minimum=0, maximum=1,
+            name='observation')
+    else:
+        observation = array_spec.BoundedArraySpec(
+            shape=(height * width,), dtype=np.float32, minimum=0, maximum=2, name='observation'
+        )
+    if not action_mask:
+        return observation
+    return {'observation': observation,
+            'legal_actions': array_spec.BoundedArraySpec(
+                shape=(height * width * 2,), dtype=np.int8, minimum=0, maximum=1,
+                name='legal_actions')}
+
+
+def _dilate(mask):
+    # 3x3 binary dilation of a stack of (H, W) masks.
+    height, width = mask.shape[-2:]
+    padded = np.pad(mask, [(0, 0)] * (mask.ndim - 2) + [(1, 1), (1, 1)])
+    out = np.zeros_like(mask)
+    for i in range(3):
+        for j in range(3):
+            out |= padded[..., i:i + height, j:j + width]
+    return out
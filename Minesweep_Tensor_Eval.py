@@ -0,0 +1,143 @@
+import math
+import numpy as np
+from tf_agents.environments import tf_py_environment
+from tf_agents.policies import py_policy
+from tf_agents.specs import array_spec
+from tf_agents.trajectories import policy_step
+from tf_agents.trajectories import time_step as ts
+from Minesweep_Tensor_Env import COUNT_PLANE, BatchedMinesweeperEnv, _observation_spec
+from mineSweep_board import HIDDEN
+from mineSweep_solver import analyze
+
+# Boards of every evaluation come from this seed unless told otherwise, so
+# two checkpoints are always scored on the same set of boards.
+EVAL_SEED = 12345
+
+
+def evaluate(policy, height, width, mines, num_episodes=1000, seed=EVAL_SEED, max_steps=None,
+             action_mask=False, generation='random', spatial=False, max_batch=1000):
+    # Play num_episodes episodes side by side on BatchedMinesweeperEnvs of at
+    # most max_batch boards, calling the policy once per batch step. Each
+    # board plays a single episode, ending on a mine, a win or after
+    # max_steps steps. Chunk i draws its boards from child i of
+    # SeedSequence(seed), so a seed and max_batch always give the same
+    # boards while memory stays bounded by max_batch. Accepts TF policies
+    # and PyPolicies; action_mask and spatial must match what the policy
+    # expects and generation should match the boards the policy was
+    # trained on.
+    max_steps = max_steps or height * width * 2
+    sizes = [min(max_batch, num_episodes - start) for start in range(0, num_episodes, max_batch)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    chunks = [_play(policy, BatchedMinesweeperEnv(height, width, mines, size, seed=child,
+                                                  action_mask=action_mask, generation=generation,
+                                                  spatial=spatial), max_steps)
+              for size, child in zip(sizes, seeds)]
+    won, lost, rewards, steps, revealed = (np.concatenate(parts) for parts in zip(*chunks))
+
+    return {
+        'episodes': num_episodes,
+        'win_rate': _proportion_interval(won.sum(), num_episodes),
+        'mean_reward': _mean_interval(rewards),
+        'mean_revealed_fraction': _mean_interval(revealed),
+        'mean_steps_to_loss': _mean_interval(steps[lost]),
+    }
+
+
+def _play(policy, env, max_steps):
+    # One episode on every board of env; returns per-board (won, lost,
+    # rewards, steps, revealed fraction)
+    count = env.batch_size
+    is_py_policy = isinstance(policy, py_policy.PyPolicy)
+    step_env = env if is_py_policy else tf_py_environment.TFPyEnvironment(env)
+    safe_cells = env.height * env.width - env.mines
+
+    time_step = step_env.reset()
+    policy_state = policy.get_initial_state(count)
+    done = np.zeros(count, dtype=bool)
+    won = np.zeros(count, dtype=bool)
+    lost = np.zeros(count, dtype=bool)
+    rewards = np.zeros(count)
+    steps = np.zeros(count, dtype=np.int64)
+    revealed = np.zeros(count)
+
+    for _ in range(max_steps):
+        action_step = policy.action(time_step, policy_state)
+        policy_state = action_step.state
+        time_step = step_env.step(action_step.action)
+
+        reward = np.asarray(time_step.reward)
+        is_last = np.asarray(time_step.is_last())
+        active = ~done
+        rewards[active] += reward[active]
+        steps[active] += 1
+        revealed[active] = env.revealed_count[active] / safe_cells
+
+        lost |= active & is_last
+        won |= active & ~is_last & (revealed >= 1)
+        done |= lost | won
+        if done.all():
+            break
+    return won, lost, rewards, steps, revealed
+
+
+class SolverPolicy(py_policy.PyPolicy):
+    # Non-learned baseline: reveals a cell the solver proves safe, otherwise
+    # the covered cell with the lowest mine probability, ties broken at
+    # random. Never flags. The revealed numbers come from the observation,
+    # so evaluate it with spatial=True.
+    def __init__(self, height, width, mines, action_mask=False, seed=None, max_component=24):
+        action_spec = array_spec.BoundedArraySpec(
+            shape=(), dtype=np.int32, minimum=0, maximum=height * width * 2 - 1, name='action')
+        observation_spec = _observation_spec(height, width, action_mask, spatial=True)
+        super().__init__(ts.time_step_spec(observation_spec), action_spec)
+        self.mines = mines
+        self.max_component = max_component
+        self._rng = np.random.default_rng(seed)
+
+    def _action(self, time_step, policy_state):
+        observation = time_step.observation
+        if isinstance(observation, dict):
+            observation = observation['observation']
+        planes = np.asarray(observation).argmax(axis=-1)
+        views = np.where(planes >= COUNT_PLANE, planes - COUNT_PLANE, HIDDEN)
+        if views.ndim == 2:
+            return policy_step.PolicyStep(np.int32(self.choose(views)), policy_state, ())
+        actions = np.array([self.choose(view) for view in views], dtype=np.int32)
+        return policy_step.PolicyStep(actions, policy_state, ())
+
+    def choose(self, view):
+        # Reveal action for one agent-facing view
+        safe, _, _ = analyze(view, self.mines, exact=False)
+        if safe:
+            cells = sorted(safe)
+        else:
+            _, _, probabilities = analyze(view, self.mines, max_component=self.max_component)
+            probabilities = np.where(view < 0, probabilities, np.inf).ravel()
+            cells = np.flatnonzero(probabilities == probabilities.min())
+        return int(cells[self._rng.integers(len(cells))]) * 2
+
+
+def _mean_interval(values, z=1.96):
+    # (mean, low, high) with a normal-approximation 95% interval
+    if not len(values):
+        return (math.nan, math.nan, math.nan)
+    mean = float(np.mean(values))
+    half = z * float(np.std(values, ddof=1)) / math.sqrt(len(values)) if len(values) > 1 else 0.0
+    return (mean, mean - half, mean + half)
+
+
+def _proportion_interval(successes, trials, z=1.96):
+    # (rate, low, high) with a Wilson score 95% interval
+    rate = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (rate + z * z / (2 * trials)) / denominator
+    half = z * math.sqrt(rate * (1 - rate) / trials + z * z / (4 * trials * trials)) / denominator
+    return (rate, centre - half, centre + half)
+
+
+def format_report(results):
+    lines = [f"Episodes: {results['episodes']}"]
+    for name in ('win_rate', 'mean_reward', 'mean_revealed_fraction', 'mean_steps_to_loss'):
+        value, low, high = results[name]
+        lines.append(f"{name}: {value:.4f} (95% CI {low:.4f} - {high:.4f})")
+    return '\n'.join(lines)
@@ -1,65 +1,68 @@
 import tkinter as tk
 from tkinter import messagebox
+import numpy as np
+from mineSweep_board import FLAGGED, HIDDEN, MINE
+from mineSweep_render import EXPLODED, BoardRenderer
+
+
+def display_cells(state, board):
+    # Env state (0 hidden, 1 revealed, 2 flagged) to renderer cell values
+    state = np.asarray(state)
+    board = np.asarray(board)
+    cells = np.where(state == 1, board, HIDDEN)
+    cells = np.where((state == 1) & (board == MINE), EXPLODED, cells)
+    return np.where(state == 2, FLAGGED, cells)
 
 
 class MinesweeperGUI(tk.Tk):
-    def __init__(self, env):
+    def __init__(self, env, fps=30):
         super().__init__()
 
         # Initialize the environment
         self.env = env
 
-        # Create the game grid and buttons
-        self.buttons = [[tk.Button(self, text="", width=3, height=1,
-                                   command=lambda row=row, col=col: self.perform_action(row, col, 0))
-                         for col in range(self.env.width)] for row in range(self.env.height)]
-
-        for row in range(self.env.height):
-            for col in range(self.env.width):
-                self.buttons[row][col].grid(row=row, column=col)
-                self.buttons[row][col].bind(
-                    '<Button-3>', lambda event, row=row, col=col: self.right_click(event, row, col))
+        # Draw the game grid on one canvas instead of a button per cell
+        self.renderer = BoardRenderer(self, self.env.height, self.env.width, fps=fps)
+        self.renderer.canvas.grid(row=0, column=0)
+        self.renderer.canvas.bind('<Button-1>', self.left_click)
+        self.renderer.canvas.bind('<Button-3>', self.right_click)
 
-    def perform_action(self, row, col, action_type):
-        observation, reward, done, _ = self.env.step(action)
-        self.update_buttons()
-        reward = reward.numpy()[0]
-        done = done.numpy()[0]
-        if done:
-            if reward < 0:
+    def perform_action(self, row, col, action_type, interactive=True):
+        time_step = self.env.step(self._encode_action(row, col, action_type))
+        self.update_buttons(force=interactive)
+        if interactive and time_step.is_last():
+            if time_step.reward < 0:
                 messagebox.showinfo("Game Over", "You hit a mine!")
             else:
                 messagebox.showinfo("Congratulations",
                                     "You cleared the minefield!")
 
-    def update_buttons(self):
-        for row in range(self.env.height):
-            for col in range(self.env.width):
-                if self.env.state[row][col] == 1:
-                    if self.env.board[row][col] == -1:
-                        self.buttons[row][col].config(text="M")
-                    else:
-                        self.buttons[row][col].config(
-                            text=str(self.env.board[row][col]))
-                elif self.env.state[row][col] == 2:
-                    self.buttons[row][col].config(text="F")
-                else:
-                    self.buttons[row][col].config(text="")
+    def display_cells(self):
+        return display_cells(self.env.state, self.env.board)
+
+    def update_buttons(self, force=False):
+        self.renderer.request(self.display_cells, force=force)
+
     def _encode_action(self, row, col, action_type):
-        return row * self.width * 2 + col * 2 + action_type
-    def right_click(self, event, row, col):
+        return row * self.env.width * 2 + col * 2 + action_type
+
+    def left_click(self, event):
+        self.perform_action(*self.renderer.cell_at(event.x, event.y), 0)
+
+    def right_click(self, event):
+        row, col = self.renderer.cell_at(event.x, event.y)
         if self.env.state[row][col] != 1:
             self.perform_action(row, col, 1)
+
     def update(self, agent_action=None):
         if agent_action is not None:
             row = agent_action // (self.env.width * 2)
             col = (agent_action % (self.env.width * 2)) // 2
             action_type = agent_action % 2
-            self.perform_action(row, col, action_type)
-        self.update_buttons()
-
-    
+            self.perform_action(row, col, action_type, interactive=False)
+        else:
+            self.update_buttons()
 
     def reset(self):
         self.env.reset()
-        self.update_buttons()
+        self.update_buttons(force=True)
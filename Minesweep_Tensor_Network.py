@@ -0,0 +1,51 @@
+import tensorflow as tf
+from tf_agents.networks import network
+from tf_agents.networks import q_network
+from tf_agents.networks import utils
+from tf_agents.utils import nest_utils
+
+
+class ConvQNetwork(network.Network):
+    # Fully convolutional Q-network for spatial observations (see
+    # MinesweeperEnv's spatial option). Same-padded convolutions keep the
+    # (H, W) grid and a final 1x1 convolution gives a reveal and a flag
+    # Q-value per cell. The (H, W, 2) map flattens to the envs' action order,
+    # row * W * 2 + col * 2 + action_type. No weight depends on the board
+    # size, so a trained network moves to other sizes with for_board().
+    def __init__(self, input_tensor_spec, action_spec, conv_layer_params=((32, 3),) * 4,
+                 activation_fn=tf.keras.activations.relu, name='ConvQNetwork'):
+        q_network.validate_specs(action_spec, input_tensor_spec)
+        height, width = input_tensor_spec.shape[:2]
+        action_spec = tf.nest.flatten(action_spec)[0]
+        num_actions = action_spec.maximum - action_spec.minimum + 1
+        if num_actions != height * width * 2:
+            raise ValueError(f"Expected {height * width * 2} actions for a {height}x{width} "
+                             f"board, got {num_actions}")
+        super().__init__(input_tensor_spec=input_tensor_spec, state_spec=(), name=name)
+
+        self._conv_layers = [
+            tf.keras.layers.Conv2D(filters, kernel_size, padding='same', activation=activation_fn,
+                                   kernel_initializer=tf.keras.initializers.VarianceScaling())
+            for filters, kernel_size in conv_layer_params]
+        self._q_value_layer = tf.keras.layers.Conv2D(
+            2, 1,
+            kernel_initializer=tf.random_uniform_initializer(minval=-0.03, maxval=0.03),
+            bias_initializer=tf.constant_initializer(-0.2))
+
+    def call(self, observation, step_type=None, network_state=(), training=False):
+        outer_rank = nest_utils.get_outer_rank(observation, self.input_tensor_spec)
+        batch_squash = utils.BatchSquash(outer_rank)
+        state = batch_squash.flatten(observation)
+        for layer in self._conv_layers:
+            state = layer(state, training=training)
+        q_values = self._q_value_layer(state, training=training)
+        q_values = tf.reshape(q_values, [tf.shape(q_values)[0], -1])
+        return batch_squash.unflatten(q_values), network_state
+
+    def for_board(self, input_tensor_spec, action_spec):
+        # Copy of this network for another board size, sharing no variables
+        # but starting from the current weights
+        copy = self.copy(input_tensor_spec=input_tensor_spec, action_spec=action_spec)
+        copy.create_variables()
+        copy.set_weights(self.get_weights())
+        return copy
@@ -0,0 +1,119 @@
+import numpy as np
+import tensorflow as tf
+
+
+class SumTree:
+    # Binary tree over `size` leaf priorities where every node holds the sum
+    # of its children. Updates and sampling work on whole batches of leaves
+    # at once and touch O(log n) nodes per leaf.
+    def __init__(self, size):
+        self.size = size
+        self._leaves = 1 << max(size - 1, 0).bit_length()
+        self._tree = np.zeros(2 * self._leaves)
+
+    @property
+    def total(self):
+        return self._tree[1]
+
+    def __getitem__(self, leaves):
+        return self._tree[np.asarray(leaves) + self._leaves]
+
+    def update(self, leaves, priorities):
+        nodes = np.asarray(leaves) + self._leaves
+        self._tree[nodes] = priorities
+        nodes = np.unique(nodes // 2)
+        while nodes[0] >= 1:
+            self._tree[nodes] = self._tree[2 * nodes] + self._tree[2 * nodes + 1]
+            if nodes[0] == 1:
+                break
+            nodes = np.unique(nodes // 2)
+
+    def find(self, values):
+        # Leaf of every prefix-sum value, descending all of them together
+        values = np.minimum(np.asarray(values, dtype=np.float64), np.nextafter(self.total, 0))
+        nodes = np.ones(len(values), dtype=np.int64)
+        while nodes[0] < self._leaves:
+            left = 2 * nodes
+            go_right = values >= self._tree[left]
+            values = np.where(go_right, values - self._tree[left], values)
+            nodes = np.where(go_right, left + 1, left)
+        return nodes - self._leaves
+
+
+class PrioritizedReplayBuffer:
+    # Proportional prioritized replay of (s, s') pairs for DqnAgent. Storage
+    # is laid out like TFUniformReplayBuffer: `max_length` frames for each of
+    # `batch_size` env slots, allocated from `data_spec` (the agent's
+    # collect_data_spec). Pair (t, t+1) of slot b is leaf t * batch_size + b
+    # of a sum tree; new pairs get the largest priority seen so far, and a
+    # pair whose second frame is not written yet has priority 0.
+    #
+    # add_batch is a drop-in driver observer and also runs inside compiled
+    # drivers through tf.numpy_function. sample() returns the experience,
+    # the sampled leaves and importance-sampling weights for
+    # agent.train(experience, weights=weights); update_priorities() takes
+    # the td_error of the resulting loss info.
+    def __init__(self, data_spec, batch_size, max_length, alpha=0.6, epsilon=1e-3, seed=None):
+        self.data_spec = data_spec
+        self.batch_size = batch_size
+        self.max_length = max_length
+        self.alpha = alpha
+        self.epsilon = epsilon
+        self._specs = tf.nest.flatten(data_spec)
+        self._storage = [np.zeros((max_length, batch_size) + tuple(spec.shape),
+                                  dtype=spec.dtype.as_numpy_dtype)
+                         for spec in self._specs]
+        self._tree = SumTree(max_length * batch_size)
+        self._max_priority = 1.0
+        self._frames = 0  # Frames written per slot
+        self._rng = np.random.default_rng(seed)
+
+    def num_frames(self):
+        return min(self._frames, self.max_length) * self.batch_size
+
+    def add_batch(self, items):
+        flat = tf.nest.flatten(items)
+        return tf.numpy_function(self._add, flat, tf.int64, stateful=True, name='add_batch')
+
+    def _add(self, *flat):
+        position = self._frames % self.max_length
+        for storage, values in zip(self._storage, flat):
+            storage[position] = values
+        slots = np.arange(self.batch_size)
+        # The pair starting here now waits for its next frame, the pair
+        # ending here becomes sampleable
+        self._tree.update(position * self.batch_size + slots, 0.0)
+        if self._frames:
+            previous = (position - 1) % self.max_length
+            self._tree.update(previous * self.batch_size + slots, self._max_priority)
+        self._frames += 1
+        return np.int64(self._frames)
+
+    def sample(self, sample_batch_size, beta=0.4):
+        # Stratified proportional sampling: one leaf per equal slice of the
+        # total priority. Weights are (N * P(i)) ** -beta over their maximum.
+        total = self._tree.total
+        if total <= 0:
+            raise ValueError("The replay buffer holds no complete (s, s') pairs yet")
+        bounds = (np.arange(sample_batch_size) + self._rng.random(sample_batch_size))
+        leaves = self._tree.find(bounds * total / sample_batch_size)
+
+        probabilities = self._tree[leaves] / total
+        count = max(min(self._frames - 1, self.max_length - 1), 1) * self.batch_size
+        weights = (count * probabilities) ** -beta
+        weights /= weights.max()
+
+        frames, slots = np.divmod(leaves, self.batch_size)
+        pairs = np.stack([frames, (frames + 1) % self.max_length], axis=1)
+        flat = [tf.convert_to_tensor(storage[pairs, slots[:, None]]) for storage in self._storage]
+        experience = tf.nest.pack_sequence_as(self.data_spec, flat)
+        return experience, leaves, tf.convert_to_tensor(weights, dtype=tf.float32)
+
+    def update_priorities(self, leaves, td_errors):
+        priorities = (np.abs(np.asarray(td_errors, dtype=np.float64)).reshape(-1)
+                      + self.epsilon) ** self.alpha
+        # Leaves overwritten since they were sampled keep their new priority
+        live = self._tree[leaves] > 0
+        if live.any():
+            self._tree.update(np.asarray(leaves)[live], priorities[live])
+        self._max_priority = max(self._max_priority, float(priorities.max()))
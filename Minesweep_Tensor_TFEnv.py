@@ -0,0 +1,187 @@
+import tensorflow as tf
+from Minesweep_Tensor_Env import COUNT_PLANE, FLAGGED_PLANE, HIDDEN_PLANE, SPATIAL_CHANNELS
+from tf_agents.environments import tf_environment
+from tf_agents.specs import tensor_spec
+from tf_agents.trajectories import time_step as ts
+
+
+class TFMinesweeperEnv(tf_environment.TFEnvironment):
+    # Minesweeper dynamics written in TF ops, so a driver can run collection
+    # entirely inside tf.function without a py_function round-trip per step.
+    # Matches BatchedMinesweeperEnv: same action encoding, observation and
+    # rewards, and a board that terminated is reset on its next step.
+    # Supports the 'random' and 'first_move_safe' generation modes; no-guess
+    # boards need the Python solver and BatchedMinesweeperEnv.
+    def __init__(self, height, width, mines, batch_size=1, seed=None, action_mask=False,
+                 generation='random', spatial=False):
+        if generation not in ('random', 'first_move_safe'):
+            raise ValueError(f"TFMinesweeperEnv does not support {generation!r} generation")
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.action_mask = action_mask
+        self.generation = generation
+        self.spatial = spatial
+
+        action_spec = tensor_spec.BoundedTensorSpec(
+            shape=(), dtype=tf.int32, minimum=0, maximum=height * width * 2 - 1, name='action')
+        if spatial:
+            observation_spec = tensor_spec.BoundedTensorSpec(
+                shape=(height, width, SPATIAL_CHANNELS), dtype=tf.float32, minimum=0, maximum=1,
+                name='observation')
+        else:
+            observation_spec = tensor_spec.BoundedTensorSpec(
+                shape=(height * width,), dtype=tf.float32, minimum=0, maximum=2,
+                name='observation')
+        if action_mask:
+            observation_spec = {
+                'observation': observation_spec,
+                'legal_actions': tensor_spec.BoundedTensorSpec(
+                    shape=(height * width * 2,), dtype=tf.int8, minimum=0, maximum=1,
+                    name='legal_actions')}
+        super().__init__(ts.time_step_spec(observation_spec), action_spec, batch_size)
+
+        if seed is None:
+            self._rng = tf.random.Generator.from_non_deterministic_state()
+        else:
+            self._rng = tf.random.Generator.from_seed(seed)
+
+        self._board = tf.Variable(self.generate_boards(), trainable=False)
+        self._state = tf.Variable(
+            tf.zeros([batch_size, height, width], tf.int32), trainable=False)
+        self._step_type = tf.Variable(
+            tf.fill([batch_size], ts.StepType.FIRST), trainable=False)
+        self._reward = tf.Variable(tf.zeros([batch_size]), trainable=False)
+        self._discount = tf.Variable(tf.ones([batch_size]), trainable=False)
+        # Boards still waiting for their first action in lazy generation
+        self._pending = tf.Variable(
+            tf.fill([batch_size], generation != 'random'), trainable=False)
+
+    @property
+    def board(self):
+        return self._board
+
+    @property
+    def state(self):
+        return self._state
+
+    def generate_boards(self, safe_cells=None, count=None):
+        # `count` boards (default batch_size). Mines are the `mines` largest
+        # of a row of random keys per board; neighbour counts come from a 3x3
+        # convolution of the mine mask. Keys around flat safe_cells (-1 for
+        # none) are pushed below 0, like mineSweep_board.safe_area.
+        count = self.batch_size if count is None else count
+        keys = self._rng.uniform([count, self.height * self.width])
+        if safe_cells is not None:
+            area = tf.one_hot(safe_cells, self.height * self.width)
+            if self.mines <= self.height * self.width - 9:
+                area = tf.nn.max_pool2d(
+                    tf.reshape(area, [count, self.height, self.width, 1]),
+                    ksize=3, strides=1, padding='SAME')
+                area = tf.reshape(area, [count, -1])
+            keys = tf.where(area > 0, -1.0, keys)
+        threshold = tf.math.top_k(keys, k=self.mines).values[:, -1:]
+        mines = tf.reshape(keys >= threshold, [count, self.height, self.width])
+        counts = tf.nn.conv2d(tf.cast(mines, tf.float32)[..., None],
+                              tf.ones([3, 3, 1, 1]), strides=1, padding='SAME')
+        counts = tf.cast(counts[..., 0], tf.int32)
+        return tf.where(mines, -1, counts)
+
+    def redraw_boards(self, board, mask, safe_cells=None):
+        # `board` with fresh boards in the rows of `mask`. Only those rows
+        # are drawn, and steps where no board needs one skip generation.
+        def draw():
+            rows = tf.where(mask)
+            cells = None if safe_cells is None else tf.gather_nd(safe_cells, rows)
+            fresh = self.generate_boards(cells, count=tf.shape(rows)[0])
+            return tf.tensor_scatter_nd_update(board, rows, fresh)
+
+        return tf.cond(tf.reduce_any(mask), draw, lambda: board)
+
+    def _current_time_step(self):
+        return ts.TimeStep(self._step_type.value(), self._reward.value(),
+                           self._discount.value(), self.get_observation())
+
+    def _reset(self):
+        self._board.assign(self.generate_boards())
+        self._pending.assign(tf.fill([self.batch_size], self.generation != 'random'))
+        self._state.assign(tf.zeros_like(self._state))
+        self._step_type.assign(tf.fill([self.batch_size], ts.StepType.FIRST))
+        self._reward.assign(tf.zeros_like(self._reward))
+        self._discount.assign(tf.ones_like(self._discount))
+        return self._current_time_step()
+
+    def _step(self, action):
+        action = tf.reshape(tf.cast(action, tf.int32), [self.batch_size])
+        restarted = tf.equal(self._step_type, ts.StepType.LAST)
+        state = tf.where(restarted[:, None, None], 0, self._state)
+        cell = action // 2
+        action_type = action % 2
+
+        if self.generation == 'random':
+            board = self.redraw_boards(self._board, restarted)
+        else:
+            # Draw each board on its first action, clear of mines around a
+            # first reveal; restarted boards wait for their next action
+            pending = restarted | self._pending
+            place = pending & ~restarted
+            board = self.redraw_boards(self._board, place,
+                                       tf.where(tf.equal(action_type, 0), cell, -1))
+            self._pending.assign(pending & ~place)
+        clicked = tf.reshape(tf.one_hot(cell, self.height * self.width, on_value=True,
+                                        off_value=False),
+                             [self.batch_size, self.height, self.width])
+        is_mine = tf.reduce_any(clicked & tf.equal(board, -1), axis=[1, 2])
+        is_revealed = tf.reduce_any(clicked & tf.equal(state, 1), axis=[1, 2])
+
+        reveal = ~restarted & tf.equal(action_type, 0)
+        flag = ~restarted & tf.equal(action_type, 1)
+        hit_mine = reveal & is_mine
+        safe = reveal & ~is_mine
+
+        state = tf.where(flag[:, None, None] & clicked, 2, state)
+        seeds = clicked & (safe & ~is_revealed)[:, None, None]
+        state = tf.where(self.reveal_cells(seeds, board), 1, state)
+
+        self._board.assign(board)
+        self._state.assign(state)
+        self._step_type.assign(tf.where(
+            restarted, ts.StepType.FIRST,
+            tf.where(hit_mine, ts.StepType.LAST, ts.StepType.MID)))
+        self._reward.assign(tf.where(safe, 1.0, tf.where(hit_mine, -1.0, 0.0)))
+        self._discount.assign(tf.where(hit_mine, 0.0, 1.0))
+        return self._current_time_step()
+
+    def reveal_cells(self, seeds, board):
+        # Grow the clicked cells through 0 cells with 3x3 max-pool dilation
+        # until no board changes; the result is each 0 region plus border.
+        zeros = tf.equal(board, 0)
+
+        def dilate(mask):
+            pooled = tf.nn.max_pool2d(tf.cast(mask, tf.float32)[..., None],
+                                      ksize=3, strides=1, padding='SAME')
+            return pooled[..., 0] > 0
+
+        def grow(mask, changed):
+            grown = mask | dilate(mask & zeros)
+            return grown, tf.reduce_any(grown != mask)
+
+        revealed, _ = tf.while_loop(lambda mask, changed: changed, grow,
+                                    (seeds, tf.constant(True)))
+        return revealed
+
+    def get_observation(self):
+        if self.spatial:
+            # Same planes as Minesweep_Tensor_Env.spatial_observation
+            codes = tf.where(self._state == 2, FLAGGED_PLANE, HIDDEN_PLANE)
+            codes = tf.where((self._state == 1) & (self._board >= 0), COUNT_PLANE + self._board,
+                             codes)
+            observation = tf.one_hot(codes, SPATIAL_CHANNELS, dtype=tf.float32)
+        else:
+            observation = tf.cast(tf.reshape(self._state, [self.batch_size, -1]), tf.float32)
+        if not self.action_mask:
+            return observation
+        # Reveal anything not revealed yet, flag only hidden cells
+        legal = tf.stack([tf.not_equal(self._state, 1), tf.equal(self._state, 0)], axis=-1)
+        return {'observation': observation,
+                'legal_actions': tf.cast(tf.reshape(legal, [self.batch_size, -1]), tf.int8)}
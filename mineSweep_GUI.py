@@ -1,298 +1,48 @@
-import tkinter as tk
-import random
-import time
+import threading
+from mineSweep_game import MinesweeperGame, train_agent
+from mineSweep_metrics import NULL_METRICS
+from mineSweep_viewer import BoardViewer, SnapshotFeed
 
 
 class Minesweeper_GUI:
-    def __init__(self, height, width, mines, agent, num_episodes):
-        self.window = tk.Tk()
-        self.total_moves = 0
-        self.best_score = None
-        self.best_reward = None
-        self.best_reward_episode = None
-        self.total_reward = 0
-        self.start_time = time.time()
+    # Rendered training: the agent trains on a MinesweeperGame through
+    # train_agent, so rewards, game ends and exploration decay are those of
+    # headless runs, and the window only draws the boards it publishes.
+    def __init__(self, height, width, mines, agent, num_episodes, metrics=NULL_METRICS,
+                 profile=None, generation='random'):
         self.height = height
         self.width = width
         self.mines = mines
-        self.board = self.generate_board()
-        self.buttons = []
         self.agent = agent
-        self.current_episode = 0
         self.num_episodes = num_episodes
-        self.move_counter = 0
-        self._game_end = False
-        self.window.title("Minesweeper")
-        self.total_correct_flags = 0
-        self.total_incorrect_flags = 0
-        self.total_num_flags = 0
-        self.best_correct_flag = 0
-        self.best_flag_episode = None
-        self.revealed_cells = set()
-        self.create_widgets()
+        self.game = MinesweeperGame(height, width, mines, generation=generation)
+        self.metrics = metrics
+        self.profile = profile  # ProfileWindow ticked once per episode
+        self.wins = 0
+        self.best_reward = None
+        # The window only shows snapshots the game loop publishes to the feed
+        self.feed = SnapshotFeed()
+        self.viewer = BoardViewer(self.feed, height, width, title="Minesweeper")
+        self.window = self.viewer.window
 
     def start_game(self):
-
-        for episode in range(self.num_episodes):
-            self.move_counter = 0
-            self.play_agent()
-            if episode < self.num_episodes - 1:  # No need to reset after the last episode
-                # Add a delay before resetting the board
-                self.window.after(1000, self.revealed_cells.clear)
-                self.window.after(1000, lambda: self.stats_label.config(
-                    text=self.get_statistics_text()))
+        # The agent plays in a worker thread while Tk runs the viewer here.
+        # Closing the window only detaches the view: training carries on
+        # headless until all episodes are played.
+        worker = threading.Thread(target=self.play_episodes)
+        worker.start()
         self.run()
-
-    def create_widgets(self):
-        frame1 = tk.Frame(master=self.window, width=800, height=800, bg="grey")
-        frame1.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
-
-        frame2 = tk.Frame(master=self.window, width=400, bg="black")
-        frame2.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
-
-        self.create_minesweeper(frame1)
-        self.create_statistics(frame2)
-
-    def generate_board(self):
-        board = [[0 for _ in range(self.width)] for _ in range(self.height)]
-
-        mines_placed = 0
-        while mines_placed < self.mines:
-            row = random.randint(0, self.height - 1)
-            col = random.randint(0, self.width - 1)
-            if board[row][col] == 0:
-                board[row][col] = "*"
-                mines_placed += 1
-
-        for row in range(self.height):
-            for col in range(self.width):
-                if board[row][col] == "*":
-                    continue
-
-                mines_count = 0
-                for i in range(-1, 2):
-                    for j in range(-1, 2):
-                        if 0 <= row + i < self.height and 0 <= col + j < self.width:
-                            if board[row + i][col + j] == "*":
-                                mines_count += 1
-
-                board[row][col] = mines_count
-
-        return board
-
-    def create_minesweeper(self, frame):
-        for i in range(self.height):
-            row_buttons = []
-            for j in range(self.width):
-                button = tk.Button(frame, text="", width=3, height=1,
-                                   command=lambda i=i, j=j: self.reveal_cell(
-                                       i, j),
-                                   highlightthickness=0)  # Add highlightthickness option
-                button.bind("<Button-3>", lambda event, i=i,
-                            j=j: self.toggle_flag(event, i, j))
-                button.grid(row=i, column=j)
-                row_buttons.append(button)
-            self.buttons.append(row_buttons)
-
-    def toggle_flag_mode(self, event):
-        self.flag_mode = not self.flag_mode
-
-    def create_statistics(self, frame):
-        self.stats_label = tk.Label(
-            frame, text=self.get_statistics_text(), justify=tk.LEFT)
-        self.stats_label.pack(fill=tk.BOTH, side=tk.TOP, expand=True)
-
-    def get_statistics_text(self):
-        elapsed_time = int(time.time() - self.start_time)
-        best_score = self.best_score if self.best_score is not None else "N/A"
-        best_reward = self.best_reward if self.best_reward is not None else "N/A"
-        best_reward_episode = self.best_reward_episode if self.best_reward_episode is not None else "N/A"
-        return f"Elapsed time: {elapsed_time}s\n Total games: {self.current_episode}\nTotal moves: {self.total_moves}\nBest Number of flags: {self.best_correct_flag}\nBest Number of flags episode : {self.best_flag_episode}\nBest score: {self.best_score}\nBest reward: {self.best_reward}\nBest reward episode: {self.best_reward_episode}"
-
-    '''def on_button_click(self, row, col):
-        if self.board[row][col] == "*":
-            self.reset_board()  # Reset the board if a mine cell is clicked
-            return
-
-        # Reveal the clicked button and its adjacent cells if needed
-        self.reveal_cell(row, col)
-
-        # Update the displayed board
-        self.update_board()
-
-        if self.check_win():
-            self._game_end = True
-
-        # Show the mines
-        for i in range(self.height):
-            for j in range(self.width):
-                if self.board[i][j] == "*":
-                    self.buttons[i][j].config(
-                        text="*", state="disabled", bg="red")
-
-        # Disable all buttons
-        for i in range(self.height):
-            for j in range(self.width):
-                self.buttons[i][j].config(state="disabled")
-        self.window.update()
-        self.window.after(10)  # 100 milliseconds delay'''
-
-    def reveal_cell(self, row, col):
-        if not self._game_end and self.buttons[row][col]['state'] in (tk.NORMAL, tk.ACTIVE):
-            if self.board[row][col] == "*":  # Handle mine cell click
-                self.reset_board()
-                return
-
-            # Convert the number to a string
-            self.buttons[row][col].config(
-                text=str(self.board[row][col]), width=3, height=1)  # Set the width to 3
-            self.buttons[row][col].config(state=tk.DISABLED)
-            self.revealed_cells.add((row, col))
-            if self.board[row][col] == 0:
-                for i in range(-1, 2):
-                    for j in range(-1, 2):
-                        if 0 <= row + i < self.height and 0 <= col + j < self.width and (row + i, col + j) not in self.revealed_cells:
-                            self.reveal_cell(row + i, col + j)
-
-    def reset_board(self):
-        self.board = self.generate_board()
-        self._game_end = False
-        self.revealed_cells.clear()
-
-        for i in range(self.height):
-            for j in range(self.width):
-                button = self.buttons[i][j]
-                # Change bg=None to bg="SystemButtonFace"
-                button.config(text="", state=tk.NORMAL, bg="grey")
-
-        self.window.focus_set()
-
-        # Update the statistics label
-        elapsed_time = int(time.time() - self.start_time)
-        if self.best_score is None or self.total_moves > self.best_score:
-            self.best_score = self.total_moves
-        self.total_reward = 0
-        self.total_moves = 0
-        self.total_correct_flags = 0
-        self.total_incorrect_flags = 0
-        self.total_num_flags = 0
-        self.stats_label.config(text=self.get_statistics_text())
-
-        # Update the board appearance
-        self.update_board()
-
-    def toggle_flag(self, event, row, col):
-        button = self.buttons[row][col]
-        if button['text'] == "":
-            button.config(text="F", bg="yellow")
-        elif button['text'] == "F":
-            button.config(text="", bg=None)
-
-    def perform_action(self, action):
-        # Unpack the action (row, col, action_type) chosen by the agent
-        row, col, action_type = action
-
-        if action_type == 0:  # Reveal
-            if self.buttons[row][col]['state'] in (tk.NORMAL, tk.ACTIVE):
-                self.reveal_cell(row, col)
-
-        elif action_type == 1:  # Flag
-            if self.board[row][col] == "*":  # Correctly flagged mine
-                reward = 2
-                self.buttons[row][col].config(text="F", state=tk.DISABLED)
-                self.revealed_cells.add((row, col))
-                self.total_correct_flags += 1
-            else:  # Incorrectly flagged cell
-                reward = -3
-                self.total_incorrect_flags += 1
-            self.total_num_flags += 1
-        # Compute the reward based on the game result
-        if self.check_win():
-            reward = 3
-            self._game_end = True  # Set the game end flag
-        elif self.board[row][col] == "*":
-            reward = -2
-            self._game_end = True  # Set the game end flag
-        else:
-            if action_type != 1:  # Only assign this reward for non-flagging actions
-                reward = 1
-
-        # Get the next state after performing the action
-        next_state = self.get_current_state()
-
-        # Update the GUI to reflect the agent's actions
-        self.update_board()
-        self.stats_label.config(text=self.get_statistics_text())
-        self.window.update()
-
-        return self.game_end, reward, next_state
-
-    def update_board(self):
-        for i in range(self.height):
-            for j in range(self.width):
-                if (i, j) in self.revealed_cells:
-                    self.buttons[i][j].config(
-                        text=self.board[i][j], state=tk.DISABLED)
-
-    def get_current_state(self):
-        current_state = []
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                if (i, j) in self.revealed_cells:
-                    row.append(self.board[i][j])
-                else:
-                    row.append(-1)
-            current_state.append(row)
-        return current_state
+        if worker.is_alive():
+            print('Viewer closed, training continues')
+        worker.join()
+
+    def play_episodes(self):
+        self.wins, self.best_reward = train_agent(
+            self.game, self.agent, self.num_episodes, metrics=self.metrics,
+            profile=self.profile, feed=self.feed)
+        self.feed.publish(self.game.get_current_state,
+                          lambda: f'Episodes {self.num_episodes}\nWins {self.wins}\n'
+                                  f'Best reward {self.best_reward}', force=True)
 
     def run(self):
-        self.window.mainloop()
-
-    def check_win(self):
-        non_mine_cells = self.height * self.width - self.mines
-        return len(self.revealed_cells) == non_mine_cells
-
-    @property
-    def game_end(self):
-        return self._game_end
-
-    def play_agent(self):
-
-        while not self.game_end:
-
-            valid_action = False
-
-            while not valid_action:
-                action = self.agent.choose_action(self.get_current_state())
-                game_over, reward, next_state = self.perform_action(action)
-                if self.buttons[action[0]][action[1]]['state'] == tk.DISABLED:
-                    valid_action = True
-
-                else:
-                    valid_action = False
-                    reward = -0.1  # Provide a small negative reward for invalid actions
-
-                if valid_action:
-                    self.move_counter += 1  # Increment the move counter only for valid actions
-                    self.total_moves += 1  # Increment the total moves counter
-                    self.total_reward = self.total_reward + reward
-
-            self.agent.update(self.get_current_state(), action,
-                              reward, self.get_current_state())
-        print(
-            f'Number of Correct Flags {self.total_correct_flags} Number of incorrect flags {self.total_incorrect_flags} Total FLags {self.total_num_flags}\nEpisode {self.current_episode} Best Corrrect flag {self.best_correct_flag} Best Flag Episode ')
-        # Update the best_reward and best_reward_episode here
-        if self.best_reward is None or self.total_reward > self.best_reward:
-            self.best_reward = self.total_reward
-            self.best_reward_episode = self.current_episode
-        if self.best_correct_flag is None or self.total_correct_flags > self.best_correct_flag:
-            self.best_correct_flag = self.total_correct_flags
-            self.best_flag_episode = self.current_episode
-
-        self.current_episode += 1  # Increment the episode counter
-        if self.current_episode < self.num_episodes:
-            self.reset_board()
-            self.revealed_cells.clear()
-            self.stats_label.config(text=self.get_statistics_text())
-            self.window.after(1000, self.play_agent)
+        self.viewer.run()
@@ -1,9 +1,36 @@
 import numpy as np
 import random
+from mineSweep_board import HIDDEN
+from mineSweep_qtable import QTable, state_key
+from mineSweep_store import MappedQTable, checkpoint_table, save_table
+from mineSweep_symmetry import canonical_action, canonicalize, original_q_values
+
+
+def legal_action_mask(states):
+    # (..., H, W, 2) mask of legal moves: only hidden cells can be revealed or
+    # flagged, revealed and flagged cells are no-ops
+    hidden = np.asarray(states) == HIDDEN
+    return np.repeat(hidden[..., None], 2, axis=-1)
+
+
+def greedy_actions(q_values, states, rng=np.random):
+    # Masked argmax over (..., H, W, 2) Q-values for one state or a batch of
+    # states. Only legal moves are picked and ties between equal values are
+    # broken at random. Returns (row, col, action) arrays.
+    q_values = np.asarray(q_values)
+    masked = np.where(legal_action_mask(states), q_values, -np.inf)
+    flat = masked.reshape(masked.shape[:-3] + (-1,))
+
+    ties = flat == flat.max(axis=-1, keepdims=True)
+    choice = np.argmax(np.where(ties, rng.random(flat.shape), -1.0), axis=-1)
+    width = q_values.shape[-2]
+    cell, action = np.divmod(choice, 2)
+    row, col = np.divmod(cell, width)
+    return row, col, action
 
 
 class MinesweeperAgent:
-    def __init__(self, height, width, num_mines, learning_rate=0.1, discount_factor=0.99, exploration_rate=1.0, exploration_decay_rate=0.001):
+    def __init__(self, height, width, num_mines, learning_rate=0.1, discount_factor=0.99, exploration_rate=1.0, exploration_decay_rate=0.001, symmetric=False):
         self.height = height
         self.width = width
         self.num_mines = num_mines
@@ -12,85 +39,120 @@ class MinesweeperAgent:
         self.discount_factor = discount_factor
         self.exploration_rate = exploration_rate
         self.exploration_decay_rate = exploration_decay_rate
+        # With symmetric, rotated and reflected copies of a state share one
+        # Q-table row, stored in the canonical orientation
+        self.symmetric = symmetric
 
-        # Initialize the Q-table as a dictionary
-        self.q_table = {}
+        # Initialize the Q-table: one (height, width, 2) row per hashed state
+        self.q_table = QTable((height, width, self.num_actions))
+        self._rng = np.random.default_rng()
 
     def flatten_state(self, state):
-
-        return tuple(cell for row in state for cell in row)
+        return np.asarray(state, dtype=np.int8).ravel()
+
+    def _state_key(self, state):
+        return self._canonical(state)[0]
+
+    def _canonical(self, state):
+        # (key, k) of a state, k the mineSweep_symmetry transform index that
+        # maps it onto its row, None without symmetry
+        flat = self.flatten_state(state)
+        if not self.symmetric:
+            return state_key(flat), None
+        canonical, k = canonicalize(flat, self.height, self.width)
+        return state_key(canonical), k
+
+    def _q_values(self, row, k):
+        # Q-values of a table row in the orientation of the state they were
+        # looked up for
+        q_values = self.q_table.values[row]
+        if k is None:
+            return q_values
+        return original_q_values(q_values, k, self.height, self.width)
 
     def _initialize_state(self, state_key):
-        state_key_str = str(state_key)
-        self.q_table[state_key_str] = np.zeros(2)
+        self.q_table.row(state_key, create=True)
 
     def _state_key_exists(self, state_key):
-        state_key_str = str(state_key)
-        return state_key_str in self.q_table
+        return state_key in self.q_table
 
     def choose_action(self, state):
-        # Explore with probability epsilon
+        # Explore with probability epsilon, over legal moves only
         if random.uniform(0, 1) < self.exploration_rate:
-            row = random.randint(0, self.height - 1)
-            col = random.randint(0, self.width - 1)
+            hidden = np.flatnonzero(np.asarray(state) == HIDDEN)
+            if not hidden.size:
+                return 0, 0, 0
+            row, col = divmod(int(hidden[random.randrange(hidden.size)]), self.width)
             action = random.randint(0, 1)  # 0 for reveal, 1 for flag
             return row, col, action
 
         # Exploit with probability (1 - epsilon)
         else:
-            state_key = self.flatten_state(state)
-            state_key_str = str(state_key)
-
-            if not self._state_key_exists(state_key):
-                self._initialize_state(state_key)
-
-            best_action_value = -np.inf
-            best_action = None
-
-            for row in range(self.height):
-                for col in range(self.width):
-                    for action in range(2):  # 0 for reveal, 1 for flag
-                        action_key = row * self.width + col
-                        action_value = self.q_table[state_key_str][action_key]
-
-                        if action_value > best_action_value:
-                            best_action_value = action_value
-                            best_action = (row, col, action)
-
-            return best_action
+            key, k = self._canonical(state)
+            q_values = self.q_table.get(key)
+            if k is not None:
+                q_values = original_q_values(q_values, k, self.height, self.width)
+            row, col, action = greedy_actions(q_values, state, self._rng)
+            return int(row), int(col), int(action)
+
+    def choose_greedy_actions(self, states):
+        # Greedy (row, col, action) arrays for a batch of states at once
+        if not self.symmetric:
+            rows = [self.q_table.row(self._state_key(state), create=True)
+                    for state in states]
+            return greedy_actions(self.q_table.values[rows], states, self._rng)
+        keys = [self._canonical(state) for state in states]
+        rows = [self.q_table.row(key, create=True) for key, _ in keys]
+        q_values = np.stack([self._q_values(row, k) for row, (_, k) in zip(rows, keys)])
+        return greedy_actions(q_values, states, self._rng)
 
     def learn(self, state, action, reward, next_state):
-        state_key = self.flatten_state(state)
-        next_state_key = self.flatten_state(next_state)
+        key, k = self._canonical(state)
+        if k is not None:
+            action = canonical_action(action, k, self.height, self.width)
         row, col, action_type = action
 
-        # Initialize the state_key in q_table if it does not exist
-        if state_key not in self.q_table:
-            self.q_table[state_key] = np.zeros(
-                (self.height, self.width, self.num_actions))
-
-        current_q_value = self.q_table[state_key][row, col, action_type]
+        # Create both rows before indexing, inserting may grow the matrix
+        # (the max over the next row does not depend on its orientation)
+        state_row = self.q_table.row(key, create=True)
+        next_state_row = self.q_table.row(
+            self._state_key(next_state), create=True)
+        q_values = self.q_table.values
 
-        # Initialize the next_state_key in q_table if it does not exist
-        if next_state_key not in self.q_table:
-            self.q_table[next_state_key] = np.zeros(
-                (self.height, self.width, self.num_actions))
-
-        next_max_q_value = np.max(self.q_table[next_state_key])
+        current_q_value = q_values[state_row, row, col, action_type]
+        next_max_q_value = np.max(q_values[next_state_row])
         new_q_value = current_q_value + self.learning_rate * \
             (reward + self.discount_factor * next_max_q_value - current_q_value)
-        self.q_table[state_key][row, col, action_type] = new_q_value
+        q_values[state_row, row, col, action_type] = new_q_value
+        self.q_table.mark_dirty(state_row)
 
     def decay_exploration_rate(self):
         self.exploration_rate = max(
             self.exploration_rate * (1 - self.exploration_decay_rate), 0.01)
 
+    def key_scheme(self):
+        # How states become Q-table keys, saved with the table. Whole-board
+        # keys depend on the board size and on canonicalization.
+        return {'agent': 'board', 'height': self.height, 'width': self.width,
+                'symmetric': self.symmetric}
+
     def save(self, filename):
-        np.save(filename, self.q_table)
+        # Write a full snapshot of the Q-table directory
+        save_table(self.q_table, filename, self.key_scheme())
+
+    def checkpoint(self, filename):
+        # Append only the states learned since the last save or checkpoint
+        checkpoint_table(self.q_table, filename, self.key_scheme())
 
     def load(self, filename):
-        # Load the Q-table from a file
-        self.q_table = np.load(filename, allow_pickle=True).item()
+        # Map the saved Q-table; states are read lazily on first use
+        base = MappedQTable(filename)
+        if base.value_shape != self.q_table.value_shape:
+            raise ValueError(f"{filename} holds values of shape {base.value_shape}")
+        if base.key_scheme != self.key_scheme():
+            raise ValueError(f"{filename} holds keys of scheme {base.key_scheme}, "
+                             f"not {self.key_scheme()}")
+        self.q_table = QTable(self.q_table.value_shape, base=base)
 
     def update(self, state, action, reward, next_state):
         self.learn(state, action, reward, next_state)
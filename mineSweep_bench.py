@@ -0,0 +1,261 @@
+import argparse
+import functools
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+from mineSweep_agent import MinesweeperAgent
+from mineSweep_board import HIDDEN, MINE
+from mineSweep_game import MinesweeperGame
+
+# Board sizes as (height, width, mines); 100x100 keeps expert mine density
+SIZES = {
+    '9x9': (9, 9, 10),
+    '16x16': (16, 16, 40),
+    '30x16': (16, 30, 99),
+    '100x100': (100, 100, 2000),
+}
+
+
+def _random_play(height, width, mines, count, rng):
+    # (state, action, reward, next_state) transitions of a uniformly random
+    # player on seeded boards, the input of the agent benchmarks
+    game = MinesweeperGame(height, width, mines, seed=int(rng.integers(2 ** 32)))
+    transitions = []
+    state = game.get_current_state()
+    while len(transitions) < count:
+        hidden = np.flatnonzero(state == HIDDEN)
+        row, col = divmod(int(hidden[rng.integers(hidden.size)]), width)
+        action = (row, col, int(rng.integers(2)))
+        game_over, reward, next_state = game.perform_action(action)
+        transitions.append((state, action, reward, next_state))
+        state = next_state
+        if game_over or not (state == HIDDEN).any():
+            game.reset_board()
+            state = game.get_current_state()
+    return transitions
+
+
+# Each benchmark builds its fixture and returns (op, setup). setup, when
+# given, runs untimed before every op and returns the op's arguments.
+
+def bench_generate_board(height, width, mines, number, rng):
+    from Minesweep_Tensor_Env import MinesweeperEnv
+    env = MinesweeperEnv(height, width, mines, seed=int(rng.integers(2 ** 32)))
+    return env.generate_board, None
+
+
+def bench_env_step(height, width, mines, number, rng):
+    # Random reveal actions; the env restarts on its own after a mine
+    from Minesweep_Tensor_Env import MinesweeperEnv
+    env = MinesweeperEnv(height, width, mines, seed=int(rng.integers(2 ** 32)))
+    actions = iter(rng.integers(height * width, size=2 * number + 100) * 2)
+    return lambda: env.step(np.int32(next(actions))), None
+
+
+def bench_batched_env_step(height, width, mines, number, rng, boards=1024):
+    # One step of `boards` boards with legal-action masks under random
+    # actions; boards restart on their own after a mine
+    from Minesweep_Tensor_Env import BatchedMinesweeperEnv
+    env = BatchedMinesweeperEnv(height, width, mines, boards, seed=int(rng.integers(2 ** 32)),
+                                action_mask=True)
+    actions = iter(rng.integers(height * width * 2, size=(number, boards), dtype=np.int32))
+    return lambda: env.step(next(actions)), None
+
+
+def bench_reveal_cell(height, width, mines, number, rng):
+    # A click on a random safe cell of a fresh board
+    from Minesweep_Tensor_Env import MinesweeperEnv
+    env = MinesweeperEnv(height, width, mines, seed=int(rng.integers(2 ** 32)))
+
+    def setup():
+        env.reset()
+        cell = rng.choice(np.flatnonzero(env.board != MINE))
+        return divmod(int(cell), width)
+    return env.reveal_cell, setup
+
+
+def bench_choose_action(height, width, mines, number, rng):
+    # Greedy choice, the path that looks up the Q-table
+    agent = MinesweeperAgent(height, width, mines, exploration_rate=0)
+    agent._rng = np.random.default_rng(int(rng.integers(2 ** 32)))
+    states = iter([transition[0] for transition in _random_play(
+        height, width, mines, 2 * number + 100, rng)])
+    return lambda: agent.choose_action(next(states)), None
+
+
+def bench_learn(height, width, mines, number, rng):
+    agent = MinesweeperAgent(height, width, mines)
+    transitions = iter(_random_play(height, width, mines, 2 * number + 100, rng))
+    return lambda: agent.learn(*next(transitions)), None
+
+
+def bench_dqn_train_step(height, width, mines, number, rng):
+    # One compiled DqnAgent.train call on a random batch of the DQN script's
+    # shape (64 pairs of steps); the first call traces the function
+    import tensorflow as tf
+    from tf_agents.agents.dqn import dqn_agent
+    from tf_agents.networks import q_network
+    from tf_agents.specs import tensor_spec
+    from tf_agents.trajectories import time_step as ts
+    from tf_agents.trajectories import trajectory
+    from tf_agents.utils import common
+    from Minesweep_Tensor_Env import _observation_spec
+
+    tf.random.set_seed(int(rng.integers(2 ** 31)))
+    observation_spec = tensor_spec.from_spec(_observation_spec(height, width, False))
+    action_spec = tensor_spec.BoundedTensorSpec(
+        shape=(), dtype=tf.int32, minimum=0, maximum=height * width * 2 - 1, name='action')
+    q_net = q_network.QNetwork(observation_spec, action_spec, fc_layer_params=(100, 50))
+    agent = dqn_agent.DqnAgent(ts.time_step_spec(observation_spec), action_spec,
+                               q_network=q_net,
+                               optimizer=tf.keras.optimizers.Adam(learning_rate=1e-3),
+                               td_errors_loss_fn=common.element_wise_squared_loss,
+                               train_step_counter=tf.Variable(0, dtype=tf.int64))
+    agent.initialize()
+    train = common.function(agent.train)
+    # Mid-episode steps with board-like observations and bounded rewards
+    shape = (64, 2)
+    observation = tf.random.uniform(shape + (height * width,), maxval=3, dtype=tf.int32)
+    experience = trajectory.Trajectory(
+        step_type=tf.fill(shape, ts.StepType.MID),
+        observation=tf.cast(observation, tf.float32),
+        action=tf.random.uniform(shape, maxval=height * width * 2, dtype=tf.int32),
+        policy_info=(),
+        next_step_type=tf.fill(shape, ts.StepType.MID),
+        reward=tf.random.uniform(shape, -1, 1),
+        discount=tf.ones(shape))
+    return lambda: train(experience).loss.numpy(), None
+
+
+BENCHMARKS = {
+    'generate_board': bench_generate_board,
+    'env_step': bench_env_step,
+    'batched_env_step': bench_batched_env_step,
+    'batched_env_step_1': functools.partial(bench_batched_env_step, boards=1),
+    'reveal_cell': bench_reveal_cell,
+    'choose_action': bench_choose_action,
+    'learn': bench_learn,
+    'dqn_train_step': bench_dqn_train_step,
+}
+
+
+def _run_ops(op, setup, count, times=None):
+    for i in range(count):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter_ns()
+        op(*args)
+        if times is not None:
+            times[i] = time.perf_counter_ns() - start
+
+
+def run_benchmark(name, size, number=200, warmup=10, seed=0):
+    # Time `number` ops one by one after `warmup` untimed ones, then run a
+    # few more under tracemalloc for the peak Python heap growth. Timing and
+    # memory are separate passes since tracemalloc slows allocation down.
+    # Allocations made by TensorFlow's C++ runtime are not seen by tracemalloc.
+    height, width, mines = SIZES[size]
+    rng = np.random.default_rng(seed)
+    memory_number = min(number, 20)
+    op, setup = BENCHMARKS[name](height, width, mines, warmup + number + memory_number, rng)
+
+    _run_ops(op, setup, warmup)
+    times = np.empty(number, dtype=np.int64)
+    _run_ops(op, setup, number, times)
+
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        _run_ops(op, setup, memory_number)
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'benchmark': name,
+        'size': size,
+        'height': height,
+        'width': width,
+        'mines': mines,
+        'number': number,
+        'ops_per_sec': number / (times.sum() / 1e9),
+        'mean_us': times.mean() / 1e3,
+        'p50_us': np.percentile(times, 50) / 1e3,
+        'p99_us': np.percentile(times, 99) / 1e3,
+        'peak_memory_bytes': int(peak),
+    }
+
+
+def run_suite(benchmarks=None, sizes=None, number=200, warmup=10, seed=0, log=True):
+    results = []
+    for name in benchmarks or BENCHMARKS:
+        for size in sizes or SIZES:
+            result = run_benchmark(name, size, number=number, warmup=warmup, seed=seed)
+            if log:
+                print(f"{name:>15} {size:>8}: {result['ops_per_sec']:12.1f} ops/s "
+                      f"p50 {result['p50_us']:10.1f}us p99 {result['p99_us']:10.1f}us "
+                      f"peak {result['peak_memory_bytes'] / 1024:10.1f}KiB", file=sys.stderr)
+            results.append(result)
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'number': number,
+            'warmup': warmup,
+            'seed': seed,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'results': results,
+    }
+
+
+def compare(baseline, current):
+    # Lines of ops/sec change for every benchmark and size found in both runs
+    old = {(r['benchmark'], r['size']): r for r in baseline['results']}
+    lines = []
+    for result in current['results']:
+        previous = old.get((result['benchmark'], result['size']))
+        if previous is None:
+            continue
+        change = result['ops_per_sec'] / previous['ops_per_sec'] - 1
+        lines.append(f"{result['benchmark']:>15} {result['size']:>8}: "
+                     f"{previous['ops_per_sec']:12.1f} -> {result['ops_per_sec']:12.1f} ops/s "
+                     f"({change:+.1%})")
+    return '\n'.join(lines)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark the Minesweeper hot paths")
+    parser.add_argument('--benchmarks', nargs='+', choices=list(BENCHMARKS),
+                        help="Benchmarks to run (default: all)")
+    parser.add_argument('--sizes', nargs='+', choices=list(SIZES),
+                        help="Board sizes to run (default: all)")
+    parser.add_argument('--number', type=int, default=200, help="Timed ops per benchmark")
+    parser.add_argument('--warmup', type=int, default=10, help="Untimed ops before timing")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="Write the JSON results here instead of stdout")
+    parser.add_argument('--compare', help="Earlier JSON results to compare against")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    results = run_suite(args.benchmarks, args.sizes, number=args.number,
+                        warmup=args.warmup, seed=args.seed)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(json.load(f), results), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
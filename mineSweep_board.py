@@ -0,0 +1,189 @@
+import functools
+import numpy as np
+
+MINE = -1
+
+# Cell values of an agent-facing state; revealed cells hold their count
+HIDDEN = -1
+FLAGGED = -2
+
+# Board generation modes. 'random' places mines before the first click;
+# 'first_move_safe' draws the board on the first click and keeps that cell
+# and its neighbours clear; 'no_guess' also only accepts boards that
+# mineSweep_solver clears from there by deduction alone.
+GENERATION_MODES = ('random', 'first_move_safe', 'no_guess')
+
+_rng = np.random.default_rng()
+
+
+def neighbour_counts(mines):
+    # Padded 3x3 sliding-window sum over one or more (H, W) mine masks. The
+    # window is summed as nine shifted views so no Python loop runs per cell.
+    height, width = mines.shape[-2:]
+    padded = np.pad(mines.astype(np.int8),
+                    [(0, 0)] * (mines.ndim - 2) + [(1, 1), (1, 1)])
+    counts = np.zeros(mines.shape, dtype=np.int8)
+    for i in range(3):
+        for j in range(3):
+            counts += padded[..., i:i + height, j:j + width]
+    return counts
+
+
+@functools.lru_cache(maxsize=None)
+def neighbour_table(height, width):
+    # (H*W, 8) flat indices of the neighbours of every flat cell. Cells on
+    # the edge pad their row with their own index, which callers looking
+    # for hidden neighbours of a revealed cell skip anyway.
+    cells = np.arange(height * width).reshape(height, width)
+    padded = np.pad(cells, 1, constant_values=-1)
+    table = np.stack([padded[i:i + height, j:j + width].ravel()
+                      for i in range(3) for j in range(3) if (i, j) != (1, 1)], axis=1)
+    table = np.where(table < 0, cells.reshape(-1, 1), table)
+    table.flags.writeable = False
+    return table
+
+
+def _fill_counts(mines):
+    board = neighbour_counts(mines)
+    board[mines] = MINE
+    return board
+
+
+def safe_area(height, width, mines, safe_cells):
+    # (N, H*W) mask of the cells kept free of mines around flat safe_cells
+    # (-1 for none): the 3x3 neighbourhood, or only the cell itself when the
+    # board is too full to spare a whole neighbourhood
+    safe_cells = np.asarray(safe_cells).reshape(-1)
+    area = np.zeros((len(safe_cells), height * width), dtype=bool)
+    has = np.flatnonzero(safe_cells >= 0)
+    area[has, safe_cells[has]] = True
+    if mines <= height * width - 9:
+        area = neighbour_counts(area.reshape(-1, height, width)) > 0
+    return area.reshape(len(safe_cells), height * width)
+
+
+def generate_board(height, width, mines, rng=None, safe_cell=None):
+    # One (H, W) int8 board: MINE for mines, otherwise the neighbour count.
+    # With a flat safe_cell, that cell and its neighbours get no mines.
+    rng = _rng if rng is None else rng
+    if safe_cell is None:
+        cells = rng.choice(height * width, size=mines, replace=False)
+    else:
+        allowed = np.flatnonzero(~safe_area(height, width, mines, [safe_cell])[0])
+        cells = rng.choice(allowed, size=mines, replace=False)
+    mask = np.zeros(height * width, dtype=bool)
+    mask[cells] = True
+    return _fill_counts(mask.reshape(height, width))
+
+
+def generate_mines(count, height, width, mines, rng=None, safe_cells=None):
+    # (N, H, W) bool mine masks. Taking the `mines` smallest of a row of
+    # random keys samples without replacement for every board at once; keys
+    # of the safe area around safe_cells (see safe_area) are pushed past 1.
+    rng = _rng if rng is None else rng
+    keys = rng.random((count, height * width))
+    if safe_cells is not None:
+        keys[safe_area(height, width, mines, safe_cells)] = 2.0
+    cells = np.argpartition(keys, mines - 1, axis=1)[:, :mines]
+    mask = np.zeros((count, height * width), dtype=bool)
+    np.put_along_axis(mask, cells, True, axis=1)
+    return mask.reshape(count, height, width)
+
+
+def generate_boards(count, height, width, mines, rng=None, safe_cells=None):
+    # A whole batch of boards as one (N, H, W) int8 array
+    return _fill_counts(generate_mines(count, height, width, mines, rng, safe_cells))
+
+
+def generate_opening(height, width, mines, cell, mode, rng=None):
+    # Board for a lazily generated game whose first action is at flat `cell`
+    # (-1 when it is not a reveal), following one of GENERATION_MODES
+    if cell < 0 or mode == 'random':
+        return generate_board(height, width, mines, rng)
+    if mode == 'no_guess':
+        from mineSweep_solver import generate_no_guess_board
+        return generate_no_guess_board(height, width, mines, cell, rng)
+    return generate_board(height, width, mines, rng, safe_cell=cell)
+
+
+# Mask of flat cell i within its byte of a pack_cells bitset is CELL_BITS[i % 8]
+CELL_BITS = np.left_shift(1, np.arange(8)).astype(np.uint8)
+
+
+def pack_cells(mask):
+    # (..., H, W) bool masks to (..., ceil(H*W / 8)) uint8 bitsets; flat cell
+    # i is bit i % 8 of byte i // 8
+    cells = mask.reshape(mask.shape[:-2] + (mask.shape[-2] * mask.shape[-1],))
+    return np.packbits(cells, axis=-1, bitorder='little')
+
+
+def unpack_cells(bits, height, width):
+    # Inverse of pack_cells
+    cells = np.unpackbits(bits, axis=-1, count=height * width, bitorder='little')
+    return cells.view(bool).reshape(bits.shape[:-1] + (height, width))
+
+
+def test_cells(bits, boards, cells):
+    # Bit of flat cell cells[i] on board boards[i] of (N, bytes) bitsets
+    return (bits[boards, cells >> 3] & CELL_BITS[cells & 7]) != 0
+
+
+def label_zero_regions(board):
+    # Label the 8-connected regions of 0 cells of one or more boards without
+    # recursion. Every 0 cell starts with its own flat index as label; labels
+    # then take the minimum over the 3x3 window and jump through the label
+    # they point at until nothing changes. Returns ids numbered from 0 on
+    # every board, so they stay below H*W however many boards are stacked,
+    # and -1 elsewhere.
+    zeros = board == 0
+    size = zeros.size
+    height, width = board.shape[-2:]
+    pad = [(0, 0)] * (board.ndim - 2) + [(1, 1), (1, 1)]
+    labels = np.where(zeros, np.arange(size).reshape(board.shape), size)
+    flat_zeros = zeros.ravel()
+    padded = np.pad(labels, pad, constant_values=size)
+    inner = padded[..., 1:-1, 1:-1]
+
+    while True:
+        inner[...] = labels
+        merged = labels.copy()
+        for i in range(3):
+            for j in range(3):
+                np.minimum(merged, padded[..., i:i + height, j:j + width],
+                           out=merged)
+        merged[~zeros] = size
+        flat = merged.ravel()
+        flat[flat_zeros] = flat[flat[flat_zeros]]
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+
+    # A label is the smallest flat index of its region, so the board it
+    # belongs to is label // (H*W); ids restart at each board's first label
+    roots, ids = np.unique(labels.ravel()[flat_zeros], return_inverse=True)
+    first = np.searchsorted(roots, roots // (height * width) * (height * width))
+    compact = np.full(size, -1, dtype=np.int32)
+    compact[flat_zeros] = ids - first[ids]
+    return compact.reshape(board.shape)
+
+
+def zero_regions(board):
+    # For one (H, W) board return (labels, regions). regions[k] holds the flat
+    # indices of 0 region k plus its numbered border, which is exactly what a
+    # click on any 0 cell of the region reveals.
+    labels = label_zero_regions(board)
+    height, width = board.shape
+    padded = np.pad(labels, 1, constant_values=-1)
+    cells = np.arange(height * width).reshape(height, width)
+
+    keys = []
+    for i in range(3):
+        for j in range(3):
+            neighbour = padded[i:i + height, j:j + width]
+            found = neighbour >= 0
+            keys.append(neighbour[found].astype(np.int64) * cells.size
+                        + cells[found])
+    keys = np.unique(np.concatenate(keys))
+    region_ids, members = np.divmod(keys, cells.size)
+    bounds = np.flatnonzero(np.diff(region_ids)) + 1
+    return labels, np.split(members, bounds) if keys.size else []
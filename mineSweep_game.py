@@ -0,0 +1,156 @@
+import numpy as np
+from mineSweep_board import MINE, generate_opening, zero_regions
+from mineSweep_metrics import NULL_METRICS
+from mineSweep_state import GameState
+
+
+class MinesweeperGame:
+    # Pure NumPy game core: +1 for a reveal, +2 or -3 for a flag, -2 for a
+    # mine and +3 for a win. Headless and rendered training (Minesweeper_GUI)
+    # both play it, so agents train without Tk.
+    # generation is one of mineSweep_board.GENERATION_MODES; outside 'random'
+    # the board is drawn on the first action.
+    def __init__(self, height, width, mines, seed=None, generation='random'):
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.generation = generation
+        self._rng = np.random.default_rng(seed)
+        # Revealed count, flags, frontier and win kept up to date per move
+        self.game_state = GameState(height, width, mines)
+        self.reset_board()
+
+    def reset_board(self):
+        self.board = None
+        if self.generation == 'random':
+            self.place_board()
+        self.game_state.reset()
+        self._game_end = False
+        self.total_moves = 0
+        self.total_reward = 0
+        self.total_correct_flags = 0
+        self.total_incorrect_flags = 0
+        self.total_num_flags = 0
+
+    def place_board(self, cell=-1):
+        self.board = generate_opening(self.height, self.width, self.mines, cell,
+                                      self.generation, self._rng)
+        self._zero_labels, self._zero_regions = zero_regions(self.board)
+
+    def reveal_cell(self, row, col):
+        if self.board[row, col] == 0:
+            cells = self._zero_regions[self._zero_labels[row, col]]
+        else:
+            cells = np.array([row * self.width + col])
+        self.game_state.reveal(cells, self.board.flat[cells])
+
+    def perform_action(self, action):
+        # Unpack the action (row, col, action_type) chosen by the agent
+        row, col, action_type = action
+        if self.board is None:
+            self.place_board(row * self.width + col if action_type == 0 else -1)
+
+        if action_type == 0:  # Reveal
+            if self.board[row, col] == MINE:
+                reward = -2
+                self._game_end = True
+            else:
+                self.reveal_cell(row, col)
+                reward = 1
+
+        else:  # Flag
+            if self.board[row, col] == MINE:  # Correctly flagged mine
+                reward = 2
+                self.game_state.flag(row * self.width + col)
+                self.total_correct_flags += 1
+            else:  # Incorrectly flagged cell
+                reward = -3
+                self.total_incorrect_flags += 1
+            self.total_num_flags += 1
+
+        if self.check_win():
+            reward = 3
+            self._game_end = True
+
+        self.total_moves += 1
+        self.total_reward += reward
+        return self._game_end, reward, self.get_current_state()
+
+    @property
+    def state(self):
+        return self.game_state.state
+
+    @property
+    def revealed_count(self):
+        return self.game_state.revealed_count
+
+    def get_current_state(self):
+        return self.game_state.state.copy()
+
+    def check_win(self):
+        return self.game_state.won
+
+    @property
+    def game_end(self):
+        return self._game_end
+
+
+def train_agent(game, agent, num_episodes, max_moves=None, log_interval=100,
+                checkpoint_path=None, checkpoint_interval=0, metrics=NULL_METRICS,
+                profile=None, feed=None):
+    # Headless training loop. Episodes stop on a mine, a win or after
+    # max_moves actions, since revealing an open cell never ends a game.
+    # With a checkpoint path, states learned since the last checkpoint are
+    # appended every checkpoint_interval episodes. metrics times each stage
+    # of a move and profile (a ProfileWindow) ticks once per episode. With a
+    # feed (mineSweep_viewer.SnapshotFeed) the board is published after every
+    # move for whichever viewer is attached; publishing never waits on one.
+    max_moves = max_moves or game.height * game.width * 2
+    select_timer = metrics.timer('action_selection')
+    step_timer = metrics.timer('env_step')
+    learn_timer = metrics.timer('learn')
+    best_reward = None
+    wins = 0
+
+    for episode in range(num_episodes):
+        with metrics.timer('reset'):
+            game.reset_board()
+        state = game.get_current_state()
+
+        while not game.game_end and game.total_moves < max_moves:
+            with select_timer:
+                action = agent.choose_action(state)
+            with step_timer:
+                game_over, reward, next_state = game.perform_action(action)
+            with learn_timer:
+                agent.update(state, action, reward, next_state)
+            state = next_state
+            if feed is not None:
+                feed.publish(game.get_current_state,
+                             lambda: f'Episode {episode + 1}\nWins {wins}\n'
+                                     f'Reward {game.total_reward}\nBest reward {best_reward}')
+
+        agent.decay_exploration_rate()
+        wins += game.check_win()
+        metrics.count('steps', game.total_moves)
+        metrics.count('episodes')
+        metrics.count('wins', int(game.check_win()))
+        metrics.gauge('q_table_size', len(agent.q_table))
+        metrics.gauge('exploration_rate', agent.exploration_rate)
+        metrics.maybe_emit()
+        if profile is not None:
+            profile.tick()
+        if best_reward is None or game.total_reward > best_reward:
+            best_reward = game.total_reward
+
+        if log_interval and (episode + 1) % log_interval == 0:
+            print(f'Episode {episode + 1} Wins {wins} Best reward {best_reward} '
+                  f'Correct flags {game.total_correct_flags} Incorrect flags {game.total_incorrect_flags}')
+
+        if checkpoint_path and checkpoint_interval and (episode + 1) % checkpoint_interval == 0:
+            with metrics.timer('checkpoint'):
+                agent.checkpoint(checkpoint_path)
+
+    if profile is not None:
+        profile.finish()
+    return wins, best_reward
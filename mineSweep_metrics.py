@@ -0,0 +1,170 @@
+import cProfile
+import io
+import json
+import pstats
+import time
+
+
+class _Timer:
+    # Reusable context manager adding its elapsed time to one stage
+    __slots__ = ('totals', 'stage', 'start')
+
+    def __init__(self, totals, stage):
+        self.totals = totals
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.totals[self.stage] += time.perf_counter() - self.start
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    # Stage timers, counters and gauges for training loops. Every
+    # `interval` seconds maybe_emit() writes one record with the rate of each
+    # counter, the latest gauges and the share of wall time spent per stage,
+    # as a JSON line to `path` and/or as TensorBoard scalars. A disabled
+    # instance hands out one shared no-op timer and returns straight away
+    # from every other call, so loops can stay instrumented for good.
+    def __init__(self, path=None, tensorboard_dir=None, interval=10.0, enabled=True):
+        self.enabled = enabled
+        self.interval = interval
+        self._file = open(path, 'a') if enabled and path else None
+        self._writer = None
+        if enabled and tensorboard_dir:
+            import tensorflow as tf  # Only needed for TensorBoard output
+            self._writer = tf.summary.create_file_writer(tensorboard_dir)
+        self._stage_seconds = {}
+        self._timers = {}
+        self._counters = {}
+        self._gauges = {}
+        self._start = self._last_emit = time.perf_counter()
+        self._last_counters = {}
+
+    def timer(self, stage):
+        if not self.enabled:
+            return _NULL_TIMER
+        timer = self._timers.get(stage)
+        if timer is None:
+            self._stage_seconds[stage] = 0.0
+            timer = self._timers[stage] = _Timer(self._stage_seconds, stage)
+        return timer
+
+    def count(self, name, n=1):
+        if self.enabled:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def set_count(self, name, total):
+        # For counters kept elsewhere, e.g. in TF metric variables
+        if self.enabled:
+            self._counters[name] = total
+
+    def gauge(self, name, value):
+        if self.enabled:
+            self._gauges[name] = value
+
+    def maybe_emit(self, force=False):
+        if not self.enabled:
+            return None
+        now = time.perf_counter()
+        if not force and now - self._last_emit < self.interval:
+            return None
+        record = self._record(now)
+        self._last_emit = now
+        self._last_counters = dict(self._counters)
+        for stage in self._stage_seconds:
+            self._stage_seconds[stage] = 0.0
+        self._write(record)
+        return record
+
+    def _record(self, now):
+        window = max(now - self._last_emit, 1e-9)
+        record = {'time': time.time(), 'elapsed': now - self._start, 'window': window}
+        for name, total in self._counters.items():
+            record[name] = total
+            record[name + '_per_sec'] = (total - self._last_counters.get(name, 0)) / window
+        record.update(self._gauges)
+        timed = sum(self._stage_seconds.values())
+        record['stage_share'] = {stage: seconds / window
+                                 for stage, seconds in self._stage_seconds.items()}
+        record['stage_share']['other'] = max(window - timed, 0.0) / window
+        return record
+
+    def _write(self, record):
+        if self._file is not None:
+            self._file.write(json.dumps(record) + '\n')
+            self._file.flush()
+        if self._writer is not None:
+            import tensorflow as tf
+            step = int(record.get('steps', 0))
+            with self._writer.as_default():
+                for name, value in record.items():
+                    if name == 'stage_share':
+                        for stage, share in value.items():
+                            tf.summary.scalar('stage_share/' + stage, share, step=step)
+                    elif name not in ('time',):
+                        tf.summary.scalar(name, value, step=step)
+            self._writer.flush()
+
+    def close(self):
+        if self.enabled and self._counters:
+            self.maybe_emit(force=True)
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+# Shared disabled instance, the default wherever metrics are optional
+NULL_METRICS = Metrics(enabled=False)
+
+
+class ProfileWindow:
+    # cProfile capture of a window of loop iterations: profiling starts at
+    # tick number `start` and stops `length` ticks later, then the stats are
+    # dumped to `path` (for pstats/snakeviz) and the top entries printed.
+    def __init__(self, path=None, start=0, length=0, top=20):
+        self.path = path
+        self.start = start
+        self.stop = start + length
+        self.top = top
+        self._ticks = 0
+        self._profiler = None
+
+    def tick(self):
+        if not self.path or self._ticks > self.stop:
+            return
+        if self._ticks == self.start and self.stop > self.start:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self._ticks == self.stop and self._profiler is not None:
+            self.finish()
+        self._ticks += 1
+
+    def finish(self):
+        if self._profiler is None:
+            return
+        self._profiler.disable()
+        self._profiler.dump_stats(self.path)
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(self.top)
+        print(out.getvalue())
+        self._profiler = None
@@ -0,0 +1,191 @@
+import copy
+import multiprocessing as mp
+import queue
+import random
+import numpy as np
+from mineSweep_game import MinesweeperGame
+from mineSweep_metrics import NULL_METRICS
+from mineSweep_qtable import QTable
+
+
+def _collect(seed, agent, snapshot_path, version, exploration, transitions,
+             stop, batch_size, max_moves, generation):
+    # Worker loop: play episodes with a local copy of the agent that acts
+    # greedily on the latest saved snapshot, and ship transitions in batches.
+    # Forked workers inherit the learner's random states, so the agent's
+    # exploration and tie-breaking draws are reseeded from the worker seed.
+    agent._rng = np.random.default_rng(seed)
+    random.seed(int(seed.generate_state(1)[0]))
+    game = MinesweeperGame(agent.height, agent.width, agent.num_mines, seed=seed,
+                           generation=generation)
+    max_moves = max_moves or game.height * game.width * 2
+    loaded = -1
+    batch = _empty_batch()
+
+    while not stop.is_set():
+        if version.value != loaded:
+            try:
+                agent.load(snapshot_path)
+                loaded = version.value
+            except (OSError, ValueError):  # Snapshot is being rewritten
+                pass
+        agent.exploration_rate = exploration.value
+
+        game.reset_board()
+        state = game.get_current_state()
+        while not game.game_end and game.total_moves < max_moves:
+            action = agent.choose_action(state)
+            game_over, reward, next_state = game.perform_action(action)
+            batch['states'].append(state)
+            batch['actions'].append(action)
+            batch['rewards'].append(reward)
+            batch['next_states'].append(next_state)
+            state = next_state
+
+        batch['episodes'] += 1
+        batch['wins'] += int(game.check_win())
+        batch['best_reward'] = max(batch['best_reward'], game.total_reward)
+        if len(batch['rewards']) >= batch_size:
+            _put(transitions, _pack(batch), stop)
+            batch = _empty_batch()
+
+
+def _empty_batch():
+    return {'states': [], 'actions': [], 'rewards': [], 'next_states': [],
+            'episodes': 0, 'wins': 0, 'best_reward': -np.inf}
+
+
+def _pack(batch):
+    # Stack the lists into compact arrays before they cross processes
+    batch['states'] = np.stack(batch['states']).astype(np.int8)
+    batch['next_states'] = np.stack(batch['next_states']).astype(np.int8)
+    batch['actions'] = np.array(batch['actions'], dtype=np.int32)
+    batch['rewards'] = np.array(batch['rewards'], dtype=np.float32)
+    return batch
+
+
+def _put(transitions, batch, stop):
+    # Block on a full queue, but give up once the pool is stopping
+    while not stop.is_set():
+        try:
+            transitions.put(batch, timeout=0.1)
+            return
+        except queue.Full:
+            continue
+
+
+class CollectorPool:
+    # Self-play collectors in worker processes feeding one learner. Each
+    # worker has its own game seed and a copy of the agent; the learner
+    # applies agent.learn to every streamed (state, action, reward,
+    # next_state) and periodically saves a snapshot that workers reload.
+    def __init__(self, agent, num_workers, snapshot_path, seed=0,
+                 batch_size=256, max_moves=None, generation='random'):
+        self.agent = agent
+        self.num_workers = num_workers
+        self.snapshot_path = snapshot_path
+        self.seed = seed
+        self.batch_size = batch_size
+        self.max_moves = max_moves
+        self.generation = generation
+        self._processes = []
+
+    def start(self):
+        context = mp.get_context()
+        self._version = context.Value('i', 0)
+        self._exploration = context.Value('d', self.agent.exploration_rate)
+        self._stop = context.Event()
+        self._transitions = context.Queue(maxsize=4 * self.num_workers)
+
+        # Workers start from the current table and only need an empty copy
+        self.agent.save(self.snapshot_path)
+        template = copy.copy(self.agent)
+        template.q_table = QTable(self.agent.q_table.value_shape)
+
+        seeds = np.random.SeedSequence(self.seed).spawn(self.num_workers)
+        for worker_seed in seeds:
+            process = context.Process(
+                target=_collect, daemon=True,
+                args=(worker_seed, template, self.snapshot_path, self._version,
+                      self._exploration, self._transitions, self._stop,
+                      self.batch_size, self.max_moves, self.generation))
+            process.start()
+            self._processes.append(process)
+
+    def train(self, num_episodes, snapshot_interval=100, log_interval=100,
+              metrics=NULL_METRICS, feed=None):
+        # Learn from worker batches until num_episodes have been collected.
+        # With a feed, the last board of each batch is published for an
+        # attached viewer.
+        episodes = wins = 0
+        best_reward = None
+        next_snapshot, next_log = snapshot_interval, log_interval
+
+        while episodes < num_episodes:
+            with metrics.timer('collect_wait'):
+                batch = self._next_batch()
+            with metrics.timer('learn'):
+                for transition in zip(batch['states'], batch['actions'],
+                                      batch['rewards'], batch['next_states']):
+                    state, action, reward, next_state = transition
+                    self.agent.learn(state, tuple(action), reward, next_state)
+
+            for _ in range(batch['episodes']):
+                self.agent.decay_exploration_rate()
+            self._exploration.value = self.agent.exploration_rate
+            episodes += batch['episodes']
+            wins += batch['wins']
+            if best_reward is None or batch['best_reward'] > best_reward:
+                best_reward = batch['best_reward']
+            metrics.count('steps', len(batch['actions']))
+            metrics.count('episodes', batch['episodes'])
+            metrics.count('wins', batch['wins'])
+            metrics.gauge('q_table_size', len(self.agent.q_table))
+            metrics.maybe_emit()
+            if feed is not None and len(batch['actions']):
+                feed.publish(lambda: batch['next_states'][-1],
+                             lambda: f'Episode {episodes}\nWins {wins}\nBest reward {best_reward}\n'
+                                     f'States {len(self.agent.q_table)}')
+
+            if episodes >= next_snapshot:
+                with metrics.timer('snapshot'):
+                    self.agent.save(self.snapshot_path)
+                with self._version.get_lock():
+                    self._version.value += 1
+                next_snapshot += snapshot_interval
+            if log_interval and episodes >= next_log:
+                print(f'Episode {episodes} Wins {wins} Best reward {best_reward} '
+                      f'States {len(self.agent.q_table)}')
+                next_log += log_interval
+
+        return episodes, wins, best_reward
+
+    def _next_batch(self, poll=1.0):
+        # Wait for a worker batch, failing instead of hanging once every
+        # collector has died (no-guess generation can raise, for one)
+        while True:
+            try:
+                return self._transitions.get(timeout=poll)
+            except queue.Empty:
+                if not any(process.is_alive() for process in self._processes):
+                    codes = [process.exitcode for process in self._processes]
+                    raise RuntimeError(f"All collectors exited (exit codes {codes})")
+
+    def close(self):
+        self._stop.set()
+        # Drain so workers blocked on a full queue can exit
+        while any(process.is_alive() for process in self._processes):
+            try:
+                self._transitions.get(timeout=0.1)
+            except queue.Empty:
+                pass
+        for process in self._processes:
+            process.join()
+        self._processes = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,93 @@
+import numpy as np
+import random
+from numpy.lib.stride_tricks import sliding_window_view
+from mineSweep_agent import MinesweeperAgent
+from mineSweep_board import FLAGGED, HIDDEN
+from mineSweep_qtable import QTable
+
+# Patch symbols: 0 off the board, then FLAGGED, HIDDEN and the counts 0..8
+_NUM_SYMBOLS = 12
+
+
+def _mix(codes):
+    # splitmix64 finaliser, spreads patch codes over the probing slots
+    codes = codes ^ (codes >> np.uint64(30))
+    codes = codes * np.uint64(0xBF58476D1CE4E5B9)
+    codes = codes ^ (codes >> np.uint64(27))
+    codes = codes * np.uint64(0x94D049BB133111EB)
+    return codes ^ (codes >> np.uint64(31))
+
+
+class PatchMinesweeperAgent(MinesweeperAgent):
+    # Scores every hidden cell from its k x k window. Windows are encoded as
+    # 64-bit codes and all cells share one small Q-table of (reveal, flag)
+    # values, so memory stays bounded and experience transfers between cells
+    # and boards. Windows up to 4x4 get exact codes, larger ones are hashed.
+    def __init__(self, height, width, num_mines, window=3, **kwargs):
+        super().__init__(height, width, num_mines, **kwargs)
+        self.window = window
+        self.q_table = QTable((self.num_actions,))
+        self._powers = np.uint64(_NUM_SYMBOLS) ** np.arange(
+            window * window, dtype=np.uint64)
+
+    def key_scheme(self):
+        # Window codes do not depend on the board size, so a table moves
+        # between boards of any size trained with the same window
+        return {'agent': 'patch', 'window': self.window}
+
+    def patch_codes(self, state):
+        # (H, W) uint64 codes of the window around every cell, computed in
+        # bulk over a strided view of the padded state
+        symbols = np.asarray(state, dtype=np.int64) - FLAGGED + 1
+        padded = np.pad(symbols, self.window // 2, constant_values=0)
+        windows = sliding_window_view(padded, (self.window, self.window))
+        windows = windows.reshape(self.height, self.width, -1).astype(np.uint64)
+        return _mix(windows @ self._powers)
+
+    def _candidates(self, state):
+        state = np.asarray(state)
+        cells = np.flatnonzero(state == HIDDEN)
+        codes = self.patch_codes(state).ravel()[cells]
+        return cells, self.q_table.rows(codes, create=True)
+
+    def choose_action(self, state):
+        cells, rows = self._candidates(state)
+        if not cells.size:
+            return 0, 0, 0
+
+        # Explore with probability epsilon, over hidden cells only
+        if random.uniform(0, 1) < self.exploration_rate:
+            cell = cells[random.randrange(cells.size)]
+            action = random.randint(0, 1)  # 0 for reveal, 1 for flag
+
+        # Exploit with probability (1 - epsilon)
+        else:
+            q_values = self.q_table.values[rows].ravel()
+            ties = np.flatnonzero(q_values == q_values.max())
+            choice = ties[self._rng.integers(ties.size)]
+            cell, action = cells[choice // 2], choice % 2
+
+        row, col = divmod(int(cell), self.width)
+        return row, col, int(action)
+
+    def choose_greedy_actions(self, states):
+        exploration_rate, self.exploration_rate = self.exploration_rate, 0
+        try:
+            actions = [self.choose_action(state) for state in states]
+        finally:
+            self.exploration_rate = exploration_rate
+        return tuple(np.array(column) for column in zip(*actions))
+
+    def learn(self, state, action, reward, next_state):
+        row, col, action_type = action
+        code = self.patch_codes(state)[row, col]
+        state_row = self.q_table.rows([code], create=True)[0]
+        _, next_rows = self._candidates(next_state)
+        q_values = self.q_table.values
+
+        current_q_value = q_values[state_row, action_type]
+        next_max_q_value = np.max(q_values[next_rows]) if next_rows.size else 0.0
+        new_q_value = current_q_value + self.learning_rate * \
+            (reward + self.discount_factor * next_max_q_value - current_q_value)
+        q_values[state_row, action_type] = new_q_value
+        self.q_table.mark_dirty(state_row)
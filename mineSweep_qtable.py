@@ -0,0 +1,159 @@
+import hashlib
+import numpy as np
+
+
+def state_key(state):
+    # 64-bit key of a board state: blake2b over its int8 bytes. Unlike
+    # hash() it is stable across processes, so keys can be saved and shared.
+    data = np.ascontiguousarray(state, dtype=np.int8).tobytes()
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+class QTable:
+    # Q-values keyed by 64-bit state keys. Every state owns one row of a
+    # single growable float32 matrix; an open-addressing table with linear
+    # probing maps keys to rows. Two states whose keys collide share a row.
+    # An optional read-only `base` (a MappedQTable) is consulted lazily: a
+    # key missing in memory starts from its saved values instead of zeros.
+    def __init__(self, value_shape, capacity=1024, base=None):
+        self.value_shape = tuple(value_shape)
+        self.base = base
+        self.values = np.zeros((capacity,) + self.value_shape, dtype=np.float32)
+        self.keys = np.zeros(capacity, dtype=np.uint64)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self._size = 0
+        self._slot_keys = np.zeros(2 * capacity, dtype=np.uint64)
+        self._slot_rows = np.full(2 * capacity, -1, dtype=np.int64)
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, key):
+        return self.row(key) >= 0 or (self.base is not None and key in self.base)
+
+    def _probe(self, key):
+        mask = len(self._slot_rows) - 1
+        slot = key & mask
+        while self._slot_rows[slot] >= 0 and self._slot_keys[slot] != key:
+            slot = (slot + 1) & mask
+        return slot
+
+    def row(self, key, create=False):
+        # Row index of `key`, or -1 if it is missing and create is False
+        slot = self._probe(key)
+        row = int(self._slot_rows[slot])
+        if row >= 0 or not create:
+            return row
+
+        if self._size == len(self.keys):
+            self._grow()
+            slot = self._probe(key)
+        row = self._size
+        self._size += 1
+        self.keys[row] = key
+        self._slot_keys[slot] = key
+        self._slot_rows[slot] = row
+        if self.base is not None:
+            saved = self.base.get(key)
+            if saved is not None:
+                self.values[row] = saved
+        return row
+
+    def rows(self, keys, create=False):
+        # Vectorized row() for an array of keys; duplicates are allowed
+        keys = np.asarray(keys, dtype=np.uint64)
+        if create:
+            unique = np.unique(keys)
+            missing = unique[self._find(unique) < 0]
+            if missing.size:
+                self._insert(missing)
+        return self._find(keys)
+
+    def _find(self, keys):
+        # Probe all keys in lockstep; each round resolves hits and empty slots
+        mask = np.uint64(len(self._slot_rows) - 1)
+        slots = keys & mask
+        rows = np.full(len(keys), -1, dtype=np.int64)
+        pending = np.arange(len(keys))
+        while pending.size:
+            slot_rows = self._slot_rows[slots[pending]]
+            found = slot_rows >= 0
+            hit = found & (self._slot_keys[slots[pending]] == keys[pending])
+            rows[pending[hit]] = slot_rows[hit]
+            pending = pending[found & ~hit]
+            slots[pending] = (slots[pending] + 1) & mask
+        return rows
+
+    def _insert(self, keys):
+        # Add distinct keys that are not in the table yet
+        while self._size + len(keys) > len(self.keys):
+            self._grow()
+        rows = np.arange(self._size, self._size + len(keys))
+        self.keys[rows] = keys
+        self._size += len(keys)
+        self._place(keys, rows)
+        if self.base is not None:
+            found, saved = self.base.lookup(keys)
+            self.values[rows[found]] = saved[found]
+
+    def _place(self, keys, rows):
+        # Linear probing for a batch: a key takes its slot when the slot is
+        # empty and no other pending key claimed it first, otherwise it moves
+        # on once the slot is taken.
+        mask = np.uint64(len(self._slot_rows) - 1)
+        slots = keys & mask
+        pending = np.arange(len(keys))
+        while pending.size:
+            free = self._slot_rows[slots[pending]] < 0
+            claimed, first = np.unique(slots[pending[free]], return_index=True)
+            winners = pending[free][first]
+            self._slot_keys[claimed] = keys[winners]
+            self._slot_rows[claimed] = rows[winners]
+
+            taken = pending[~free]
+            slots[taken] = (slots[taken] + 1) & mask
+            placed = np.zeros(len(keys), dtype=bool)
+            placed[winners] = True
+            pending = pending[~placed[pending]]
+
+    def get(self, key):
+        # A view of the values of `key`, created as zeros if missing. The view
+        # is only valid until the next insert grows the matrix.
+        row = self.row(key, create=True)
+        return self.values[row]
+
+    def _grow(self):
+        # Double the value matrix and rebuild the slot table at load <= 0.5
+        capacity = 2 * len(self.keys)
+        values = np.zeros((capacity,) + self.value_shape, dtype=np.float32)
+        values[:self._size] = self.values[:self._size]
+        keys = np.zeros(capacity, dtype=np.uint64)
+        keys[:self._size] = self.keys[:self._size]
+        dirty = np.zeros(capacity, dtype=bool)
+        dirty[:self._size] = self.dirty[:self._size]
+        self.values, self.keys, self.dirty = values, keys, dirty
+
+        self._slot_keys = np.zeros(2 * capacity, dtype=np.uint64)
+        self._slot_rows = np.full(2 * capacity, -1, dtype=np.int64)
+        self._place(self.keys[:self._size], np.arange(self._size))
+
+    def mark_dirty(self, rows):
+        # Flag rows whose values changed since the last save or checkpoint
+        self.dirty[rows] = True
+
+    def clear_dirty(self):
+        self.dirty[:] = False
+
+    def dirty_items(self):
+        rows = np.flatnonzero(self.dirty[:self._size])
+        return self.keys[rows], self.values[rows]
+
+    def items(self):
+        # All keys and values, in-memory rows overriding the base
+        keys, values = self.keys[:self._size], self.values[:self._size]
+        if self.base is None:
+            return keys.copy(), values.copy()
+        base_keys = self.base.keys()
+        base_keys = base_keys[~np.isin(base_keys, keys)]
+        return (np.concatenate([base_keys, keys]),
+                np.concatenate([self.base.lookup(base_keys)[1], values]))
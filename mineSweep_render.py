@@ -0,0 +1,76 @@
+import time
+import tkinter as tk
+import numpy as np
+from mineSweep_board import FLAGGED, HIDDEN
+
+# Display-only code for a revealed mine; other cells use state values
+EXPLODED = -3
+
+_FILL = {HIDDEN: "grey", FLAGGED: "yellow", EXPLODED: "red"}
+_TEXT = {HIDDEN: "", FLAGGED: "F", EXPLODED: "*", 0: ""}
+_NUMBER_COLOURS = ["black", "blue", "green", "red", "navy",
+                   "maroon", "teal", "black", "dim gray"]
+
+
+class BoardRenderer:
+    # Draws a board on one tk.Canvas. Every cell is a rectangle and a text
+    # item created once; a frame only reconfigures the cells whose value
+    # changed since the last frame, and frames are capped at `fps` no matter
+    # how often request() is called.
+    def __init__(self, master, height, width, cell_size=24, fps=30, on_frame=None):
+        self.height = height
+        self.width = width
+        self.cell_size = cell_size
+        self.frame_interval = 1.0 / fps if fps else 0.0
+        self.on_frame = on_frame
+        self.canvas = tk.Canvas(master, width=width * cell_size, height=height * cell_size,
+                                bg="grey", highlightthickness=0)
+
+        self._rects = np.zeros((height, width), dtype=np.int64)
+        self._texts = np.zeros((height, width), dtype=np.int64)
+        for row in range(height):
+            for col in range(width):
+                x, y = col * cell_size, row * cell_size
+                self._rects[row, col] = self.canvas.create_rectangle(
+                    x, y, x + cell_size, y + cell_size, fill="grey", outline="black")
+                self._texts[row, col] = self.canvas.create_text(
+                    x + cell_size // 2, y + cell_size // 2, text="")
+
+        self._shown = np.full((height, width), HIDDEN, dtype=np.int8)
+        self._pending = None
+        self._last_frame = 0.0
+
+    def cell_at(self, x, y):
+        # (row, col) under a canvas pixel, for click bindings
+        return (min(int(y) // self.cell_size, self.height - 1),
+                min(int(x) // self.cell_size, self.width - 1))
+
+    def request(self, get_cells, force=False):
+        # Ask for a frame. get_cells is only called when a frame is drawn, so
+        # building the (H, W) display array costs nothing between frames.
+        self._pending = get_cells
+        if force or time.perf_counter() - self._last_frame >= self.frame_interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending is None:
+            return
+        self.draw(np.asarray(self._pending(), dtype=np.int8))
+        self._pending = None
+        self._last_frame = time.perf_counter()
+        if self.on_frame is not None:
+            self.on_frame()
+        self.canvas.update()
+
+    def draw(self, cells):
+        # Redraw only the cells that differ from what is on screen
+        for row, col in np.argwhere(cells != self._shown):
+            value = int(cells[row, col])
+            if value >= 0:
+                fill, text = "light grey", _TEXT.get(value, str(value))
+                colour = _NUMBER_COLOURS[value]
+            else:
+                fill, text, colour = _FILL[value], _TEXT[value], "black"
+            self.canvas.itemconfig(int(self._rects[row, col]), fill=fill)
+            self.canvas.itemconfig(int(self._texts[row, col]), text=text, fill=colour)
+        self._shown = cells.copy()
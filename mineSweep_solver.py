@@ -0,0 +1,426 @@
+import functools
+import math
+import numpy as np
+from mineSweep_board import HIDDEN, _rng, generate_boards, zero_regions
+
+
+@functools.lru_cache(maxsize=None)
+def neighbours(height, width):
+    # Flat indices of the up to 8 neighbours of every flat cell
+    table = []
+    for row in range(height):
+        for col in range(width):
+            table.append(tuple(r * width + c
+                               for r in range(max(row - 1, 0), min(row + 2, height))
+                               for c in range(max(col - 1, 0), min(col + 2, width))
+                               if (r, c) != (row, col)))
+    return tuple(table)
+
+
+def constraints(view, mines=frozenset()):
+    # One (cells, remaining mines) pair per revealed number next to unknown
+    # cells. view is an agent-facing (H, W) state: counts for revealed
+    # cells, anything negative for cells still covered. Cells in `mines` are
+    # known mines; flags are not trusted. Zeros count too, since a flag in
+    # the env covers a cell even once a zero has revealed it.
+    height, width = view.shape
+    table = neighbours(height, width)
+    flat = view.ravel().tolist()
+    found = {}
+    for cell in np.flatnonzero(view.ravel() >= 0).tolist():
+        unknown = []
+        remaining = flat[cell]
+        for neighbour in table[cell]:
+            if neighbour in mines:
+                remaining -= 1
+            elif flat[neighbour] < 0:
+                unknown.append(neighbour)
+        if unknown:
+            found[frozenset(unknown)] = remaining
+    return found
+
+
+def deduce(view, mines=frozenset(), num_mines=None):
+    # (safe, mines) sets of covered cells that follow from the single-cell
+    # rule (a number already satisfied, or with exactly as many unknown
+    # neighbours as missing mines) and the subset rule (A inside B leaves
+    # B - A holding the difference of their mines). With the total num_mines
+    # the mine counter settles the board once every mine is known or every
+    # unknown cell must be one.
+    found = constraints(view, mines)
+    safe, new_mines = set(), set()
+    by_cell = {}
+    for cells, remaining in found.items():
+        if remaining == 0:
+            safe |= cells
+        elif remaining == len(cells):
+            new_mines |= cells
+        for cell in cells:
+            by_cell.setdefault(cell, []).append(cells)
+
+    if not safe and not new_mines:
+        for cells, remaining in found.items():
+            for other in by_cell[next(iter(cells))]:
+                if other is cells or len(other) <= len(cells) or not cells < other:
+                    continue
+                rest = other - cells
+                rest_mines = found[other] - remaining
+                if rest_mines == 0:
+                    safe |= rest
+                elif rest_mines == len(rest):
+                    new_mines |= rest
+
+    if not safe and not new_mines and num_mines is not None:
+        unknown = set(np.flatnonzero(view.ravel() < 0).tolist()) - set(mines)
+        if len(mines) == num_mines:
+            safe = unknown
+        elif len(mines) + len(unknown) == num_mines:
+            new_mines = unknown
+    return safe, new_mines
+
+
+def view_of(state, board):
+    # Agent-facing view of an env state (0 hidden, 1 revealed, 2 flagged) and
+    # its board: counts where revealed, HIDDEN elsewhere. Flags stay covered.
+    return np.where(np.asarray(state) == 1, board, HIDDEN)
+
+
+def reduce(found):
+    # Fixed point of the single-cell and subset rules over a constraint dict.
+    # Known cells are substituted out and a constraint with a proper subset
+    # is replaced by the difference, so every round works on smaller sets.
+    # Returns (safe, mines, constraints on the cells still unknown).
+    found = dict(found)
+    safe, mines = set(), set()
+    while True:
+        known_safe, known_mines = set(), set()
+        for cells, remaining in found.items():
+            if remaining == 0:
+                known_safe |= cells
+            elif remaining == len(cells):
+                known_mines |= cells
+        if known_safe or known_mines:
+            safe |= known_safe
+            mines |= known_mines
+            found = _substitute(found, known_safe, known_mines)
+            continue
+
+        by_cell = {}
+        for cells in found:
+            for cell in cells:
+                by_cell.setdefault(cell, []).append(cells)
+        reduced = {}
+        for cells, remaining in found.items():
+            for other in by_cell[next(iter(cells))]:
+                if len(other) > len(cells) and cells < other and other not in reduced:
+                    reduced[other] = (other - cells, found[other] - remaining)
+        if not reduced:
+            return safe, mines, found
+        for other, (rest, remaining) in reduced.items():
+            del found[other]
+            found.setdefault(rest, remaining)
+
+
+def _substitute(found, safe, mines):
+    out = {}
+    for cells, remaining in found.items():
+        rest = cells - safe - mines
+        if rest:
+            out.setdefault(rest, remaining - len(cells & mines))
+    return out
+
+
+def linear_reduce(found, unknown=(), num_mines=None, tolerance=1e-9):
+    # Gauss-Jordan elimination of the constraints as linear equations over
+    # 0/1 cells, plus the mine count over all `unknown` cells when num_mines
+    # is given. Unknown cells off the frontier only meet the mine count, so
+    # they share one column bounded by their number. A reduced row whose
+    # right side is the largest (or smallest) value its left side can take
+    # pins every variable in it to a bound. Returns (safe, mines).
+    frontier = sorted(set().union(*found)) if found else []
+    interior = sorted(set(unknown) - set(frontier)) if num_mines is not None else []
+    columns = len(frontier) + bool(interior)
+    if not columns:
+        return set(), set()
+    index = {cell: i for i, cell in enumerate(frontier)}
+    bounds = np.ones(columns)
+    rows = len(found) + (num_mines is not None)
+    matrix = np.zeros((rows, columns + 1))
+    for row, (constraint, remaining) in enumerate(found.items()):
+        matrix[row, [index[cell] for cell in constraint]] = 1
+        matrix[row, -1] = remaining
+    if num_mines is not None:
+        matrix[-1, [index[cell] for cell in unknown if cell in index]] = 1
+        if interior:
+            matrix[-1, -2] = 1
+            bounds[-1] = len(interior)
+        matrix[-1, -1] = num_mines
+
+    pivot_row = 0
+    for col in range(columns):
+        if pivot_row == rows:
+            break
+        pivot = pivot_row + np.argmax(np.abs(matrix[pivot_row:, col]))
+        if abs(matrix[pivot, col]) < tolerance:
+            continue
+        matrix[[pivot_row, pivot]] = matrix[[pivot, pivot_row]]
+        matrix[pivot_row] /= matrix[pivot_row, col]
+        others = np.abs(matrix[:, col]) > tolerance
+        others[pivot_row] = False
+        matrix[others] -= matrix[others, col, None] * matrix[pivot_row]
+        pivot_row += 1
+
+    cells = frontier + [interior]
+    safe, mines = set(), set()
+
+    def pin(variables, to_mines):
+        for i in variables:
+            group = cells[i] if isinstance(cells[i], list) else [cells[i]]
+            (mines if to_mines else safe).update(group)
+
+    for row in matrix[:pivot_row]:
+        coefficients, total = row[:-1], row[-1]
+        positive = np.flatnonzero(coefficients > tolerance)
+        negative = np.flatnonzero(coefficients < -tolerance)
+        if abs(total - coefficients[positive] @ bounds[positive]) < tolerance:
+            pin(positive, True)
+            pin(negative, False)
+        elif abs(total - coefficients[negative] @ bounds[negative]) < tolerance:
+            pin(positive, False)
+            pin(negative, True)
+    return safe, mines
+
+
+def components(found):
+    # Constraints grouped by the frontier cells they connect
+    parent = {}
+
+    def root(cell):
+        while parent[cell] != cell:
+            parent[cell] = parent[parent[cell]]
+            cell = parent[cell]
+        return cell
+
+    for cells in found:
+        first = next(iter(cells))
+        parent.setdefault(first, first)
+        for cell in cells:
+            parent[root(parent.setdefault(cell, cell))] = root(first)
+    groups = {}
+    for cells, remaining in found.items():
+        groups.setdefault(root(next(iter(cells))), {})[cells] = remaining
+    return list(groups.values())
+
+
+def enumerate_component(found):
+    # Every mine placement over the cells of one component that satisfies
+    # its constraints, by backtracking over cells in breadth-first constraint
+    # order so each constraint is closed soon after it is opened. Returns
+    # (cells, counts, cell_counts): counts[k] placements hold k mines, and
+    # cell_counts[k, i] of them put a mine on cells[i].
+    by_cell = {}
+    for constraint in found:
+        for cell in constraint:
+            by_cell.setdefault(cell, []).append(constraint)
+    cells = []
+    seen = set()
+    queue = [min(found, key=len)]
+    visited = set(queue)
+    for constraint in queue:
+        for cell in sorted(constraint):
+            if cell in seen:
+                continue
+            seen.add(cell)
+            cells.append(cell)
+            for other in by_cell[cell]:
+                if other not in visited:
+                    visited.add(other)
+                    queue.append(other)
+    index = {cell: i for i, cell in enumerate(cells)}
+    targets = list(found.values())
+    cell_constraints = [[] for _ in cells]
+    for j, constraint in enumerate(found):
+        for cell in constraint:
+            cell_constraints[index[cell]].append(j)
+    placed = [0] * len(targets)
+    left = [len(constraint) for constraint in found]
+    assignment = [0] * len(cells)
+    counts = np.zeros(len(cells) + 1)
+    cell_counts = np.zeros((len(cells) + 1, len(cells)))
+
+    def place(i, k):
+        if i == len(cells):
+            counts[k] += 1
+            cell_counts[k] += assignment
+            return
+        for mine in (0, 1):
+            if all(placed[j] + mine <= targets[j] <= placed[j] + mine + left[j] - 1
+                   for j in cell_constraints[i]):
+                for j in cell_constraints[i]:
+                    placed[j] += mine
+                    left[j] -= 1
+                assignment[i] = mine
+                place(i + 1, k + mine)
+                for j in cell_constraints[i]:
+                    placed[j] -= mine
+                    left[j] += 1
+        assignment[i] = 0
+
+    place(0, 0)
+    return cells, counts, cell_counts
+
+
+def analyze(view, num_mines=None, exact=True, max_component=24):
+    # (safe, mines, probabilities) for an agent-facing view. Deduction runs
+    # the single-cell and subset rules, then linear reduction, until neither
+    # finds anything new. With exact, the (H, W) mine probability of every
+    # covered cell follows from enumerating each frontier component of at
+    # most max_component cells, weighted across components by the number of
+    # ways to place the remaining mines on the cells off the frontier. With
+    # a larger component, or without num_mines, components are weighted
+    # uniformly, large ones fall back to their densest constraint and the
+    # other cells share the mines left over.
+    view = np.asarray(view)
+    covered = set(np.flatnonzero(view.ravel() < 0).tolist())
+    found = constraints(view)
+    safe, mines = set(), set()
+    while True:
+        new_safe, new_mines, found = reduce(found)
+        safe |= new_safe
+        mines |= new_mines
+        unknown = covered - safe - mines
+        budget = None if num_mines is None else num_mines - len(mines)
+        new_safe, new_mines = linear_reduce(found, unknown, budget)
+        if not new_safe and not new_mines:
+            break
+        safe |= new_safe
+        mines |= new_mines
+        found = _substitute(found, new_safe, new_mines)
+    if not exact:
+        return safe, mines, None
+
+    probabilities = np.zeros(view.size)
+    probabilities[list(mines)] = 1
+    groups = components(found)
+    frontier = set().union(*found) if found else set()
+    interior = sorted(unknown - frontier)
+    small = [enumerate_component(group) for group in groups
+             if len(set().union(*group)) <= max_component]
+    large = [group for group in groups if len(set().union(*group)) > max_component]
+
+    if budget is None or large:
+        expected = 0.0
+        for cells, counts, cell_counts in small:
+            probabilities[cells] = cell_counts.sum(axis=0) / max(counts.sum(), 1)
+            expected += probabilities[cells].sum()
+            _settle(cells, counts, cell_counts, counts > 0, safe, mines)
+        for group in large:
+            for constraint, remaining in group.items():
+                cells = list(constraint)
+                probabilities[cells] = np.maximum(probabilities[cells],
+                                                  remaining / len(constraint))
+            expected += probabilities[list(set().union(*group))].sum()
+        if interior:
+            density = 0.5 if budget is None else (budget - expected) / len(interior)
+            probabilities[interior] = min(max(density, 0.0), 1.0)
+        return safe, mines, probabilities.reshape(view.shape)
+
+    # Mines on the frontier, then the log-weight of placing the rest inside
+    totals = np.ones(1)
+    for _, counts, _ in small:
+        totals = np.convolve(totals, counts)
+    log_weights = np.full(len(totals), -np.inf)
+    for k in range(min(len(totals) - 1, budget) + 1):
+        if budget - k <= len(interior):
+            log_weights[k] = _log_comb(len(interior), budget - k)
+    weights = np.exp(log_weights - log_weights.max())
+    normaliser = (totals * weights).sum()
+
+    for i, (cells, counts, cell_counts) in enumerate(small):
+        others = np.ones(1)
+        for j, (_, other_counts, _) in enumerate(small):
+            if j != i:
+                others = np.convolve(others, other_counts)
+        # Weight of component i holding k mines, summed over the others
+        with_others = np.array([(others * weights[k:k + len(others)]).sum()
+                                for k in range(len(counts))])
+        probabilities[cells] = (cell_counts * with_others[:, None]).sum(axis=0) / normaliser
+        _settle(cells, counts, cell_counts, (counts > 0) & (with_others > 0), safe, mines)
+    if interior:
+        inside = np.arange(len(totals))
+        share = np.where(inside <= budget, (budget - inside) / len(interior), 0.0)
+        probabilities[interior] = (totals * weights * share).sum() / normaliser
+    return safe, mines, probabilities.reshape(view.shape)
+
+
+def _settle(cells, counts, cell_counts, live, safe, mines):
+    # Cells free of mines, or mined, in every placement that can still occur
+    live_counts = cell_counts[live]
+    safe.update(cells[i] for i in np.flatnonzero((live_counts == 0).all(axis=0)))
+    mines.update(cells[i] for i in np.flatnonzero(
+        (live_counts == counts[live, None]).all(axis=0)))
+
+
+def _log_comb(n, k):
+    return math.lgamma(n + 1) - math.lgamma(k + 1) - math.lgamma(n - k + 1)
+
+
+def safe_actions(state, board, num_mines=None):
+    # Reveal actions, in the env encoding, of every covered cell deduction
+    # proves safe in an env state and board
+    safe, _, _ = analyze(view_of(state, board), num_mines, exact=False)
+    return np.array(sorted(safe), dtype=np.int64) * 2
+
+
+def mine_probabilities(state, board, num_mines, max_component=24):
+    # (H, W) probability that each cell of an env state and board is a
+    # mine; revealed cells are 0
+    _, _, probabilities = analyze(view_of(state, board), num_mines,
+                                  max_component=max_component)
+    return probabilities
+
+
+def solvable(board, first_cell):
+    # Whether deduction alone clears `board` after revealing flat first_cell
+    height, width = board.shape
+    labels, regions = zero_regions(board)
+    flat_board = board.ravel()
+    num_mines = int((flat_board < 0).sum())
+    view = np.full(height * width, HIDDEN, dtype=np.int8)
+    hidden_safe = height * width - num_mines
+
+    def reveal(cell):
+        if flat_board[cell] == 0:
+            cells = regions[labels.flat[cell]]
+        else:
+            cells = [cell]
+        cells = [c for c in cells if view[c] == HIDDEN]
+        view[cells] = flat_board[cells]
+        return len(cells)
+
+    if flat_board[first_cell] < 0:
+        return False
+    hidden_safe -= reveal(first_cell)
+    mines = set()
+    while hidden_safe:
+        safe, new_mines = deduce(view.reshape(height, width), mines, num_mines)
+        if not safe and not new_mines:
+            return False
+        mines |= new_mines
+        for cell in safe:
+            hidden_safe -= reveal(cell)
+    return True
+
+
+def generate_no_guess_board(height, width, mines, first_cell, rng=None, batch=16,
+                            max_attempts=10000):
+    # First-move-safe boards are drawn `batch` at a time until one is
+    # solvable from first_cell without guessing
+    rng = _rng if rng is None else rng
+    for _ in range(0, max_attempts, batch):
+        for board in generate_boards(batch, height, width, mines, rng,
+                                     safe_cells=np.full(batch, first_cell)):
+            if solvable(board, first_cell):
+                return board
+    raise RuntimeError(f"No no-guess {height}x{width} board with {mines} mines "
+                       f"found in {max_attempts} attempts")
@@ -0,0 +1,73 @@
+import numpy as np
+from mineSweep_board import FLAGGED, HIDDEN, neighbour_table
+
+
+class GameState:
+    # Agent-facing board of one game (HIDDEN, FLAGGED or the revealed count
+    # of every cell) with the totals its consumers ask for after every move.
+    # reveal, flag and unflag only touch the cells they change, so reading
+    # the revealed count, the flags or the win condition never scans the
+    # board. The frontier, a bool (H, W) plane of hidden cells next to a
+    # revealed number, is brought up to date when read: the cells revealed
+    # since the last read and their neighbours are folded in with a few
+    # array operations. Cells are flat indices.
+    def __init__(self, height, width, mines):
+        self.height = height
+        self.width = width
+        self.mines = mines
+        self.state = np.full((height, width), HIDDEN, dtype=np.int8)
+        self._frontier = np.zeros((height, width), dtype=bool)
+        self._flat = self.state.reshape(-1)
+        self._flat_frontier = self._frontier.reshape(-1)
+        self._neighbours = neighbour_table(height, width)
+        self._unfolded = []  # Cells revealed since the frontier was last read
+        self.revealed_count = 0
+        self.flag_count = 0
+
+    @property
+    def won(self):
+        return self.revealed_count == self.height * self.width - self.mines
+
+    @property
+    def frontier(self):
+        if self._unfolded:
+            cells = np.concatenate(self._unfolded)
+            self._unfolded.clear()
+            around = self._neighbours[cells[self._flat[cells] > 0]].ravel()
+            self._flat_frontier[around[self._flat[around] == HIDDEN]] = True
+            self._flat_frontier[cells] = False
+        return self._frontier
+
+    def reset(self):
+        self._flat.fill(HIDDEN)
+        self._flat_frontier.fill(False)
+        self._unfolded.clear()
+        self.revealed_count = 0
+        self.flag_count = 0
+
+    def reveal(self, cells, values):
+        # Reveal the hidden ones of `cells` showing `values` (their counts);
+        # returns how many were newly revealed
+        fresh = self._flat[cells] == HIDDEN
+        cells = cells[fresh]
+        self._flat[cells] = values[fresh]
+        self._unfolded.append(cells)
+        self.revealed_count += len(cells)
+        return len(cells)
+
+    def flag(self, cell):
+        # Flag a hidden cell; returns whether it was hidden
+        if self._flat[cell] != HIDDEN:
+            return False
+        self._flat[cell] = FLAGGED
+        self.flag_count += 1
+        self._flat_frontier[cell] = False
+        return True
+
+    def unflag(self, cell):
+        if self._flat[cell] != FLAGGED:
+            return False
+        self._flat[cell] = HIDDEN
+        self.flag_count -= 1
+        self._flat_frontier[cell] = (self._flat[self._neighbours[cell]] > 0).any()
+        return True
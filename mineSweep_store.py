@@ -0,0 +1,132 @@
+import json
+import os
+import numpy as np
+
+# On-disk Q-table: a directory with meta.json and one or more segments. Each
+# segment is a pair of .npy files, sorted uint64 keys and the float32 value
+# rows in the same order, opened with np.memmap through mmap_mode. Later
+# segments hold incremental checkpoints and override earlier ones. meta.json
+# also records the agent's key scheme (see MinesweeperAgent.key_scheme), as
+# keys of one scheme mean nothing to an agent using another.
+FORMAT = 'minesweeper-qtable'
+VERSION = 2
+
+
+def _read_meta(path):
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta.get('format') != FORMAT or meta.get('version') != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} Q-table")
+    return meta
+
+
+def _write_meta(path, meta):
+    tmp = os.path.join(path, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp, os.path.join(path, 'meta.json'))
+
+
+def _write_segment(path, name, keys, values):
+    order = np.argsort(keys, kind='stable')
+    np.save(os.path.join(path, name + '.keys.npy'), keys[order])
+    np.save(os.path.join(path, name + '.values.npy'),
+            np.ascontiguousarray(values[order], dtype=np.float32))
+
+
+class MappedQTable:
+    # Read-only view of a saved table. Nothing is read until a lookup touches
+    # it, so opening is cheap and processes mapping the same files share the
+    # page cache.
+    def __init__(self, path):
+        self.path = path
+        meta = _read_meta(path)
+        self.value_shape = tuple(meta['value_shape'])
+        self.key_scheme = meta['key_scheme']
+        self.segments = []
+        for name in reversed(meta['segments']):  # newest first
+            keys = np.load(os.path.join(path, name + '.keys.npy'), mmap_mode='r')
+            values = np.load(os.path.join(path, name + '.values.npy'), mmap_mode='r')
+            self.segments.append((keys, values))
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def get(self, key):
+        # Values of `key` from the newest segment holding it, or None
+        key = np.uint64(key)
+        for keys, values in self.segments:
+            index = np.searchsorted(keys, key)
+            if index < len(keys) and keys[index] == key:
+                return values[index]
+        return None
+
+    def lookup(self, keys):
+        # Vectorized get(): (found, values) for an array of keys
+        keys = np.asarray(keys, dtype=np.uint64)
+        found = np.zeros(len(keys), dtype=bool)
+        out = np.zeros((len(keys),) + self.value_shape, dtype=np.float32)
+        for segment_keys, segment_values in self.segments:
+            if not len(segment_keys):
+                continue
+            index = np.minimum(np.searchsorted(segment_keys, keys),
+                               len(segment_keys) - 1)
+            hit = ~found & (segment_keys[index] == keys)
+            out[hit] = segment_values[index[hit]]
+            found |= hit
+        return found, out
+
+    def keys(self):
+        return np.unique(np.concatenate([keys for keys, _ in self.segments]))
+
+    def items(self):
+        # All (keys, values) with later segments winning, loaded into memory
+        keys = self.keys()
+        return keys, self.lookup(keys)[1]
+
+
+def save_table(table, path, key_scheme):
+    # Full snapshot: merge any mapped base with the in-memory rows and
+    # replace all segments with a single one.
+    os.makedirs(path, exist_ok=True)
+    keys, values = table.items()
+    previous = _read_meta(path) if os.path.exists(os.path.join(path, 'meta.json')) else None
+    number = previous['next_segment'] if previous else 0
+
+    name = f'segment-{number:06d}'
+    _write_segment(path, name, keys, values)
+    _write_meta(path, {'format': FORMAT, 'version': VERSION,
+                       'value_shape': list(table.value_shape), 'key_scheme': key_scheme,
+                       'segments': [name], 'next_segment': number + 1})
+    if previous:
+        for old in previous['segments']:
+            for suffix in ('.keys.npy', '.values.npy'):
+                try:
+                    os.remove(os.path.join(path, old + suffix))
+                except OSError:  # Still mapped on platforms that lock files
+                    pass
+    table.clear_dirty()
+
+
+def checkpoint_table(table, path, key_scheme):
+    # Incremental checkpoint: append a segment with only the rows changed
+    # since the last save or checkpoint.
+    if not os.path.exists(os.path.join(path, 'meta.json')):
+        return save_table(table, path, key_scheme)
+    meta = _read_meta(path)
+    if tuple(meta['value_shape']) != table.value_shape:
+        raise ValueError(f"{path} holds values of shape {meta['value_shape']}")
+    if meta['key_scheme'] != key_scheme:
+        raise ValueError(f"{path} holds keys of scheme {meta['key_scheme']}, not {key_scheme}")
+
+    keys, values = table.dirty_items()
+    if len(keys):
+        name = f"segment-{meta['next_segment']:06d}"
+        _write_segment(path, name, keys, values)
+        meta['segments'].append(name)
+        meta['next_segment'] += 1
+        _write_meta(path, meta)
+    table.clear_dirty()
@@ -0,0 +1,107 @@
+import functools
+import numpy as np
+
+# Rotations and reflections of the board (the dihedral group D4). Transform t
+# flips the columns when t >= 4, then rotates by (t % 4) quarter turns. Only
+# square boards keep their shape under quarter turns, so other boards use the
+# identity, the half turn and the two flips.
+SQUARE_TRANSFORMS = tuple(range(8))
+RECTANGLE_TRANSFORMS = (0, 2, 4, 6)
+
+
+def transforms(height, width):
+    return SQUARE_TRANSFORMS if height == width else RECTANGLE_TRANSFORMS
+
+
+def transform(array, t):
+    # Apply transform t to the last two (H, W) axes of an array
+    if t >= 4:
+        array = np.flip(array, axis=-1)
+    return np.rot90(array, t % 4, axes=(-2, -1))
+
+
+def inverse(t):
+    # Reflections undo themselves, rotations are undone by the opposite turn
+    return t if t >= 4 else (4 - t) % 4
+
+
+@functools.lru_cache(maxsize=None)
+def cell_permutations(height, width):
+    # (gather, scatter) int64 arrays of shape (len(transforms), H*W). Cell i
+    # of a transformed board is cell gather[k, i] of the original, and
+    # original cell c lands on cell scatter[k, c].
+    cells = np.arange(height * width).reshape(height, width)
+    gather = np.stack([transform(cells, t).ravel() for t in transforms(height, width)])
+    scatter = np.empty_like(gather)
+    np.put_along_axis(scatter, gather, np.arange(height * width)[None], axis=1)
+    gather.flags.writeable = scatter.flags.writeable = False
+    return gather, scatter
+
+
+def canonicalize(flat_state, height, width):
+    # (canonical, k): the lexicographically smallest of the transformed
+    # copies of a flat state, and the index into transforms() that made it.
+    # States in the same orbit share their canonical copy.
+    gather, _ = cell_permutations(height, width)
+    copies = np.asarray(flat_state)[gather]
+    keys = [copy.tobytes() for copy in copies]
+    k = min(range(len(keys)), key=keys.__getitem__)
+    return copies[k], k
+
+
+def canonical_action(action, k, height, width):
+    # (row, col, action_type) on the original board to the canonical one
+    row, col, action_type = action
+    _, scatter = cell_permutations(height, width)
+    new_row, new_col = divmod(int(scatter[k, row * width + col]), width)
+    return new_row, new_col, action_type
+
+
+def original_q_values(q_values, k, height, width):
+    # (H, W, 2) Q-values of a canonical state back onto the original board
+    _, scatter = cell_permutations(height, width)
+    return np.asarray(q_values).reshape(height * width, -1)[scatter[k]].reshape(
+        height, width, -1)
+
+
+def augment_experience(experience, height, width):
+    # Batch of DqnAgent experience (outer dims [B, T]) with every symmetric
+    # copy stacked along the batch axis, copy k at rows k * B to (k + 1) * B.
+    # Flat (H*W,) and spatial (H, W, C) observations, (H*W*2,) legal-action
+    # masks and actions are permuted; everything else is tiled.
+    import tensorflow as tf  # Only needed for the DQN path
+    gather, scatter = cell_permutations(height, width)
+    copies = len(gather)
+    cells = height * width
+
+    def permute(tensor):
+        inner = tuple(tensor.shape[2:])
+        if inner == (cells,):
+            grid = tensor[..., None]
+        elif inner == (cells * 2,):
+            grid = tf.reshape(tensor, tf.concat([tf.shape(tensor)[:2], [cells, 2]], 0))
+        elif inner[:2] == (height, width):
+            grid = tf.reshape(tensor, tf.concat([tf.shape(tensor)[:2], [cells], inner[2:]], 0))
+        else:
+            return tile(tensor)
+        # [B, T, K, H*W, ...] -> [K, B, T, H*W, ...] -> [K*B, T, ...]
+        permuted = tf.gather(grid, gather, axis=2)
+        permuted = tf.experimental.numpy.moveaxis(permuted, 2, 0)
+        return tf.reshape(permuted, tf.concat([[-1], tf.shape(tensor)[1:]], 0))
+
+    def tile(tensor):
+        return tf.tile(tensor, tf.concat([[copies], tf.ones([tf.rank(tensor) - 1], tf.int32)], 0))
+
+    action = experience.action
+    cell, action_type = action // 2, action % 2
+    new_cells = tf.gather(tf.constant(scatter, dtype=action.dtype), cell, axis=1)
+    actions = tf.reshape(new_cells * 2 + action_type[None], tf.concat([[-1], tf.shape(action)[1:]], 0))
+
+    return experience._replace(
+        step_type=tile(experience.step_type),
+        observation=tf.nest.map_structure(permute, experience.observation),
+        action=actions,
+        policy_info=tf.nest.map_structure(tile, experience.policy_info),
+        next_step_type=tile(experience.next_step_type),
+        reward=tile(experience.reward),
+        discount=tile(experience.discount))
@@ -0,0 +1,88 @@
+import queue
+import time
+import tkinter as tk
+import numpy as np
+from mineSweep_render import BoardRenderer
+
+
+class SnapshotFeed:
+    # One-way channel of (cells, statistics text) snapshots from a training
+    # worker to a viewer. Only the newest snapshot is kept: publish() never
+    # waits, and when the viewer is slow or gone the old snapshot is dropped.
+    # Snapshots are throttled to one per `interval` seconds and built lazily,
+    # so an unwatched feed costs a clock read per call. Any channel with
+    # put_nowait/get_nowait works, e.g. a multiprocessing.Queue(maxsize=1) for
+    # a viewer in another process.
+    def __init__(self, interval=1 / 30, channel=None):
+        self.interval = interval
+        self.channel = channel if channel is not None else queue.Queue(maxsize=1)
+        self._last_publish = 0.0
+
+    def publish(self, get_cells, get_statistics=None, force=False):
+        now = time.perf_counter()
+        if not force and now - self._last_publish < self.interval:
+            return False
+        self._last_publish = now
+        snapshot = (np.array(get_cells(), dtype=np.int8),
+                    get_statistics() if get_statistics is not None else None)
+        try:
+            self.channel.put_nowait(snapshot)
+        except queue.Full:
+            # Replace the snapshot the viewer has not picked up yet
+            try:
+                self.channel.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.channel.put_nowait(snapshot)
+            except queue.Full:  # Lost the race to another publisher
+                pass
+        return True
+
+    def latest(self):
+        # Newest waiting snapshot, or None if nothing new was published
+        snapshot = None
+        while True:
+            try:
+                snapshot = self.channel.get_nowait()
+            except queue.Empty:
+                return snapshot
+
+
+class BoardViewer:
+    # Read-only window over a SnapshotFeed. It polls the feed from the Tk
+    # event loop and never calls into the game or the agent, so closing it
+    # leaves the worker running at full speed.
+    def __init__(self, feed, height, width, title="Minesweeper", poll_ms=33):
+        self.feed = feed
+        self.poll_ms = poll_ms
+        self.window = tk.Tk()
+        self.window.title(title)
+
+        frame1 = tk.Frame(master=self.window, bg="grey")
+        frame1.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
+        frame2 = tk.Frame(master=self.window, width=400, bg="black")
+        frame2.pack(fill=tk.BOTH, side=tk.LEFT, expand=True)
+
+        self.renderer = BoardRenderer(frame1, height, width, fps=0)
+        self.renderer.canvas.pack()
+        self.stats_label = tk.Label(frame2, text="", justify=tk.LEFT)
+        self.stats_label.pack(fill=tk.BOTH, side=tk.TOP, expand=True)
+        self.window.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        snapshot = self.feed.latest()
+        if snapshot is not None:
+            cells, statistics = snapshot
+            self.renderer.draw(cells)
+            if statistics is not None:
+                self.stats_label.config(text=statistics)
+        self.window.after(self.poll_ms, self._poll)
+
+    def run(self):
+        self.window.mainloop()
+
+
+def run_viewer(feed, height, width, title="Minesweeper"):
+    # Process entry point for watching a feed backed by a multiprocessing queue
+    BoardViewer(feed, height, width, title=title).run()
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+from mineSweep_board import generate_boards, label_zero_regions, zero_regions
+from Minesweep_Tensor_Env import BatchedMinesweeperEnv, legal_actions, spatial_observation
+
+
+def reference_step(state, board, action, width):
+    # One MinesweeperEnv-style step of a single (H, W) state on its board;
+    # returns (reward, hit_mine)
+    cell, action_type = divmod(int(action), 2)
+    row, col = divmod(cell, width)
+    if action_type == 1:
+        state[row, col] = 2
+        return 0.0, False
+    if board[row, col] < 0:
+        return -1.0, True
+    if state[row, col] != 1:
+        if board[row, col] == 0:
+            labels, regions = zero_regions(board)
+            state.flat[regions[labels[row, col]]] = 1
+        else:
+            state[row, col] = 1
+    return 1.0, False
+
+
+def check_steps(env, actions):
+    # Step env and a per-board reference side by side and compare everything
+    # the env hands out
+    count, height, width = env.batch_size, env.height, env.width
+    states = np.zeros((count, height, width), dtype=np.int8)
+    ended = np.zeros(count, dtype=bool)
+    for action in actions:
+        time_step = env.step(action)
+        boards = env.board
+        for i in range(count):
+            if ended[i]:
+                states[i] = 0
+                assert time_step.step_type[i] == 0
+                ended[i] = False
+                continue
+            reward, ended[i] = reference_step(states[i], boards[i], action[i], width)
+            assert time_step.reward[i] == reward
+        np.testing.assert_array_equal(env.state, states)
+        np.testing.assert_array_equal(env.revealed_count, (states == 1).sum(axis=(1, 2)))
+
+        observation = time_step.observation
+        if env.action_mask:
+            np.testing.assert_array_equal(observation['legal_actions'], legal_actions(states))
+            observation = observation['observation']
+        if env.spatial:
+            expected = spatial_observation(states, boards)
+        else:
+            expected = states.reshape(count, -1)
+        np.testing.assert_array_equal(observation, expected)
+
+
+@pytest.mark.parametrize('generation', ['random', 'first_move_safe', 'no_guess'])
+@pytest.mark.parametrize('spatial', [False, True])
+@pytest.mark.parametrize('action_mask', [False, True])
+def test_batched_env_matches_reference(generation, spatial, action_mask):
+    height, width, mines, count = 9, 9, 10, 8
+    env = BatchedMinesweeperEnv(height, width, mines, count, seed=3, action_mask=action_mask,
+                                generation=generation, spatial=spatial)
+    rng = np.random.default_rng(0)
+    actions = rng.integers(height * width * 2, size=(60, count)).astype(np.int32)
+    check_steps(env, actions)
+
+
+def test_zero_labels_restart_on_every_board():
+    boards = generate_boards(2000, 15, 15, 30, np.random.default_rng(0))
+    labels = label_zero_regions(boards)
+    assert labels.max() < 15 * 15
+    for board, board_labels in zip(boards[:50], labels[:50]):
+        np.testing.assert_array_equal(board_labels, zero_regions(board)[0])
+
+
+def test_large_batch_reveals_whole_regions():
+    # More zero regions across the batch than int16 holds; every board's
+    # first click lands on a zero and must open its whole region
+    height, width, mines, count = 15, 15, 30, 8000
+    env = BatchedMinesweeperEnv(height, width, mines, count, seed=1)
+    boards = env.board
+    cells = np.argmax(boards.reshape(count, -1) == 0, axis=1)
+    assert (boards.reshape(count, -1)[np.arange(count), cells] == 0).all()
+    env.step((cells * 2).astype(np.int32))
+    for board, cell, revealed in zip(boards, cells, env.revealed_count):
+        labels, regions = zero_regions(board)
+        assert revealed == len(regions[labels.flat[cell]])